@@ -4,19 +4,36 @@ Simulates ingestion of methylation and clinical lab results.
 Outputs a Nutrient Priority List based on genetic markers and symptoms.
 """
 
+import heapq
+import importlib.util
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from operator import attrgetter
+from types import MappingProxyType
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import List, Dict, Mapping, NamedTuple, Optional, Tuple
 from user_context import UserContext, LabResults, MedicalHistory
 
+# pyahocorasick (optional) scans each symptom for every keyword in one pass
+AHOCORASICK_AVAILABLE = importlib.util.find_spec("ahocorasick") is not None
 
-@dataclass
-class NutrientNeed:
-    """Represents a single nutrient need with reasoning."""
+# numpy (optional) vectorises lab classification in analyze_lab_data_batch
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# numba (optional) JIT-compiles that classification into a parallel loop over users
+NUMBA_AVAILABLE = NUMPY_AVAILABLE and importlib.util.find_spec("numba") is not None
+
+
+class NutrientNeed(NamedTuple):
+    """Represents a single nutrient need with reasoning (immutable; derive changes with _replace)."""
     nutrient: str
     priority: int  # 1 = highest, 5 = lowest
     reason: str
-    related_markers: List[str] = field(default_factory=list)
-    food_sources: List[str] = field(default_factory=list)
+    related_markers: Tuple[str, ...] = ()
+    food_sources: Tuple[str, ...] = ()
     
     def explain(self) -> str:
         """Generate a human-readable explanation."""
@@ -29,15 +46,20 @@ class NutrientPriorityList:
     user_id: str
     needs: List[NutrientNeed] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
+    # Built on first get_all_food_sources() call; needs don't change after analysis
+    _food_sources_by_nutrient: Optional[Dict[str, Tuple[str, ...]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
     
     def get_top_priorities(self, n: int = 5) -> List[NutrientNeed]:
         """Get the top N priority nutrients."""
-        sorted_needs = sorted(self.needs, key=lambda x: x.priority)
-        return sorted_needs[:n]
+        return heapq.nsmallest(n, self.needs, key=attrgetter("priority"))
     
-    def get_all_food_sources(self) -> Dict[str, List[str]]:
-        """Get all recommended food sources grouped by nutrient."""
-        return {need.nutrient: need.food_sources for need in self.needs}
+    def get_all_food_sources(self) -> Mapping[str, Tuple[str, ...]]:
+        """Get all recommended food sources grouped by nutrient (read-only view)."""
+        if self._food_sources_by_nutrient is None:
+            self._food_sources_by_nutrient = {need.nutrient: need.food_sources for need in self.needs}
+        return MappingProxyType(self._food_sources_by_nutrient)
 
 
 # Reference ranges for lab values
@@ -51,51 +73,280 @@ LAB_REFERENCE_RANGES = {
     "glucose_fasting": {"optimal_high": 100, "prediabetic": 125, "diabetic": 126, "unit": "mg/dL"},
     "omega3_index": {"low": 4, "optimal_low": 8, "optimal_high": 12, "unit": "%"}
 }
+# Shared by every analysis, so exposed read-only
+LAB_REFERENCE_RANGES = MappingProxyType({name: MappingProxyType(ref) for name, ref in LAB_REFERENCE_RANGES.items()})
+
+# Packed thresholds per LabResults field: (range key, keys the level must exceed,
+# keys the level must meet or exceed), each in ascending order. A level's status code is how many it passes.
+LAB_THRESHOLD_KEYS = {
+    "vitamin_b12_level": ("vitamin_b12", (), ("low", "optimal_low")),
+    "vitamin_d_level": ("vitamin_d", (), ("low", "optimal_low")),
+    "iron_level": ("iron", (), ("low",)),
+    "crp_level": ("crp", ("elevated", "high"), ()),
+    "homocysteine_level": ("homocysteine", ("elevated", "high"), ()),
+    "glucose_fasting": ("glucose_fasting", ("optimal_high",), ("prediabetic",)),
+}
+LAB_THRESHOLDS = {
+    lab_field: (
+        tuple(LAB_REFERENCE_RANGES[range_key][key] for key in above),
+        tuple(LAB_REFERENCE_RANGES[range_key][key] for key in at_or_above),
+    )
+    for lab_field, (range_key, above, at_or_above) in LAB_THRESHOLD_KEYS.items()
+}
 
 
 # Nutrient-to-food mapping
 NUTRIENT_FOOD_SOURCES = {
-    "Vitamin B12": [
+    "Vitamin B12": (
         "eggs", "fortified cereals", "nutritional yeast", "sardines", 
         "beef liver", "clams", "fortified plant milk"
-    ],
-    "Methylfolate": [
+    ),
+    "Methylfolate": (
         "spinach", "lentils", "asparagus", "broccoli", "avocado",
         "black-eyed peas", "brussels sprouts", "romaine lettuce"
-    ],
-    "Vitamin D": [
+    ),
+    "Vitamin D": (
         "fortified milk", "egg yolks", "salmon", "sardines",
         "fortified orange juice", "mushrooms (UV-exposed)"
-    ],
-    "Iron": [
+    ),
+    "Iron": (
         "spinach", "lentils", "chickpeas", "beef", "fortified cereals",
         "pumpkin seeds", "quinoa", "dark chocolate"
-    ],
-    "Omega-3 Fatty Acids": [
+    ),
+    "Omega-3 Fatty Acids": (
         "salmon", "sardines", "walnuts", "flaxseed", "chia seeds",
         "mackerel", "hemp seeds"
-    ],
-    "Anti-inflammatory Foods": [
+    ),
+    "Anti-inflammatory Foods": (
         "turmeric", "ginger", "berries", "leafy greens", "fatty fish",
         "olive oil", "tomatoes", "nuts", "green tea"
-    ],
-    "Magnesium": [
+    ),
+    "Magnesium": (
         "spinach", "pumpkin seeds", "black beans", "almonds",
         "avocado", "dark chocolate", "quinoa"
-    ],
-    "Fiber": [
+    ),
+    "Fiber": (
         "oats", "beans", "lentils", "berries", "broccoli",
         "apples", "whole grains", "chia seeds"
-    ],
-    "Antioxidants": [
+    ),
+    "Antioxidants": (
         "berries", "dark leafy greens", "pecans", "artichokes",
         "beets", "red cabbage", "dark chocolate"
-    ],
-    "Chromium": [
+    ),
+    "Chromium": (
         "broccoli", "grape juice", "whole grains", "beef",
         "green beans", "potatoes"
+    )
+}
+NUTRIENT_FOOD_SOURCES = MappingProxyType(NUTRIENT_FOOD_SOURCES)
+
+# Report label for each priority level (index = priority - 1)
+PRIORITY_LABELS = ("🔴 CRITICAL", "🟠 HIGH", "🟡 MODERATE", "🟢 PREVENTIVE", "⚪ SUPPORTIVE")
+
+
+def _index_source_substrings() -> Dict[str, frozenset]:
+    """Map every lowercase substring of every food source (including "") to the sources containing it."""
+    index = defaultdict(set)
+    for sources in NUTRIENT_FOOD_SOURCES.values():
+        for source in sources:
+            lowered = source.lower()
+            index[""].add(source)
+            for start in range(len(lowered)):
+                for end in range(start + 1, len(lowered) + 1):
+                    index[lowered[start:end]].add(source)
+    return {substring: frozenset(found) for substring, found in index.items()}
+
+
+# Allergy lookup: the sources an allergy string would rule out, in one dict hit
+SOURCE_SUBSTRINGS = _index_source_substrings()
+
+# MTHFR variant -> (nutrient, priority, reason template, related markers) for each need it triggers
+_MTHFR_REDUCED_CONVERSION = (
+    ("Methylfolate", 1,
+     "MTHFR {variant} variant detected - reduced ability to convert folic acid to active methylfolate",
+     ("MTHFR", "homocysteine")),
+    ("Vitamin B12", 1,
+     "MTHFR {variant} requires adequate B12 for proper methylation cycle function",
+     ("MTHFR", "methylation")),
+)
+MTHFR_VARIANT_NEEDS = {
+    "C677T": _MTHFR_REDUCED_CONVERSION,
+    "COMPOUND": _MTHFR_REDUCED_CONVERSION,
+    "HOMOZYGOUS": _MTHFR_REDUCED_CONVERSION,
+    "A1298C": (
+        ("Methylfolate", 2,
+         "MTHFR A1298C variant - moderately reduced folate metabolism",
+         ("MTHFR", "BH4")),
+    ),
+}
+
+# Symptom keyword -> needs it triggers (immutable, so shared across calls)
+SYMPTOM_NUTRIENT_MAP = {
+    "fatigue": [
+        NutrientNeed(
+            nutrient="Iron",
+            priority=3,
+            reason="Fatigue reported - iron deficiency is a common cause",
+            related_markers=("symptoms: fatigue",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Iron"]
+        ),
+        NutrientNeed(
+            nutrient="Vitamin B12",
+            priority=3,
+            reason="Fatigue reported - B12 supports energy metabolism",
+            related_markers=("symptoms: fatigue",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Vitamin B12"]
+        )
+    ],
+    "brain_fog": [
+        NutrientNeed(
+            nutrient="Omega-3 Fatty Acids",
+            priority=3,
+            reason="Brain fog reported - omega-3s support cognitive function",
+            related_markers=("symptoms: brain fog",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
+        )
+    ],
+    "joint_pain": [
+        NutrientNeed(
+            nutrient="Anti-inflammatory Foods",
+            priority=3,
+            reason="Joint pain reported - anti-inflammatory foods may help",
+            related_markers=("symptoms: joint pain",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Anti-inflammatory Foods"]
+        )
+    ],
+    "anxiety": [
+        NutrientNeed(
+            nutrient="Magnesium",
+            priority=3,
+            reason="Anxiety reported - magnesium supports nervous system calm",
+            related_markers=("symptoms: anxiety",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Magnesium"]
+        )
+    ],
+    "weak_immunity": [
+        NutrientNeed(
+            nutrient="Vitamin D",
+            priority=3,
+            reason="Immune concerns - Vitamin D is crucial for immune function",
+            related_markers=("symptoms: immunity",),
+            food_sources=NUTRIENT_FOOD_SOURCES["Vitamin D"]
+        )
     ]
 }
+SYMPTOM_KEYS = tuple(SYMPTOM_NUTRIENT_MAP)
+
+
+def _build_symptom_automaton():
+    """Aho-Corasick automaton over SYMPTOM_KEYS; None if pyahocorasick is missing."""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+    import ahocorasick
+    
+    automaton = ahocorasick.Automaton()
+    for key in SYMPTOM_KEYS:
+        automaton.add_word(key, key)
+    automaton.make_automaton()
+    return automaton
+
+
+SYMPTOM_AUTOMATON = _build_symptom_automaton()
+
+# Family-history conditions recognised by analyze_family_history, matched in one pass
+FAMILY_HISTORY_PATTERN = re.compile(r"diabetes|heart|cardiovascular|cancer")
+
+
+@lru_cache(maxsize=512)
+def filter_food_sources(nutrient: str, allergies: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    NUTRIENT_FOOD_SOURCES[nutrient] minus any source containing one of the allergies.
+    Allergies should be a sorted tuple of lowercase strings so equal sets share a cache entry.
+    """
+    sources = NUTRIENT_FOOD_SOURCES[nutrient]
+    if not allergies:
+        return sources
+    excluded = frozenset().union(*(SOURCE_SUBSTRINGS.get(allergy, ()) for allergy in allergies))
+    return tuple(source for source in sources if source not in excluded)
+
+
+def classify_lab_levels(lab_results: LabResults) -> Dict[str, int]:
+    """
+    Classify every reported lab level against LAB_THRESHOLDS in one pass.
+    Returns {LabResults field: status code}; missing levels are left out.
+    """
+    codes = {}
+    for lab_field, (above, at_or_above) in LAB_THRESHOLDS.items():
+        level = getattr(lab_results, lab_field)
+        if level is not None:
+            # bisect_left counts thresholds strictly below the level, bisect_right those at or below
+            codes[lab_field] = bisect_left(above, level) + bisect_right(at_or_above, level)
+    return codes
+
+
+@lru_cache(maxsize=None)
+def lab_classify_kernel():
+    """
+    Numba kernel classifying a users x labs level matrix in place; None if numba is missing.
+    Compiled on first use so importing this module never pays numba's start-up cost.
+    """
+    if not NUMBA_AVAILABLE:
+        return None
+    from numba import njit, prange
+    
+    @njit(parallel=True)
+    def classify(levels, above, at_or_above, out_codes):
+        for u in prange(levels.shape[0]):
+            for j in range(levels.shape[1]):
+                level = levels[u, j]
+                if level != level:  # NaN: lab not reported
+                    out_codes[u, j] = -1
+                    continue
+                code = 0
+                for k in range(above.shape[1]):
+                    if level > above[j, k]:
+                        code += 1
+                for k in range(at_or_above.shape[1]):
+                    if level >= at_or_above[j, k]:
+                        code += 1
+                out_codes[u, j] = code
+    
+    return classify
+
+
+def classify_lab_matrix(lab_results_list: List[Optional[LabResults]]) -> List[Dict[str, int]]:
+    """
+    Batch form of classify_lab_levels: one codes dict per entry ({} for None).
+    With numpy the levels are packed into a users x labs matrix and compared column-wise.
+    """
+    if not NUMPY_AVAILABLE or not lab_results_list:
+        return [classify_lab_levels(lr) if lr else {} for lr in lab_results_list]
+    import numpy as np
+    
+    fields = tuple(LAB_THRESHOLDS)
+    levels = np.array(
+        [[getattr(lr, f) if lr else None for f in fields] for lr in lab_results_list],
+        dtype=float
+    )
+    kernel = lab_classify_kernel()
+    if kernel is not None:
+        # Threshold tables padded with +inf, which no level passes
+        width = max(max(len(above), len(at_or_above)) for above, at_or_above in LAB_THRESHOLDS.values())
+        above_table = np.full((len(fields), width), np.inf)
+        at_or_above_table = np.full((len(fields), width), np.inf)
+        for j, (above, at_or_above) in enumerate(LAB_THRESHOLDS.values()):
+            above_table[j, :len(above)] = above
+            at_or_above_table[j, :len(at_or_above)] = at_or_above
+        codes = np.empty(levels.shape, dtype=np.int64)
+        kernel(levels, above_table, at_or_above_table, codes)
+    else:
+        codes = np.zeros(levels.shape, dtype=np.int64)
+        for j, (above, at_or_above) in enumerate(LAB_THRESHOLDS.values()):
+            column = levels[:, j, None]
+            codes[:, j] = (column > np.array(above)).sum(axis=1) + (column >= np.array(at_or_above)).sum(axis=1)
+        codes[np.isnan(levels)] = -1
+    
+    return [{f: code for f, code in zip(fields, row) if code >= 0} for row in codes.tolist()]
 
 
 def analyze_methylation_markers(lab_results: LabResults) -> List[NutrientNeed]:
@@ -106,28 +357,13 @@ def analyze_methylation_markers(lab_results: LabResults) -> List[NutrientNeed]:
     if lab_results.mthfr_variant:
         variant = lab_results.mthfr_variant.upper()
         
-        if variant in ["C677T", "COMPOUND", "HOMOZYGOUS"]:
-            needs.append(NutrientNeed(
-                nutrient="Methylfolate",
-                priority=1,
-                reason=f"MTHFR {variant} variant detected - reduced ability to convert folic acid to active methylfolate",
-                related_markers=["MTHFR", "homocysteine"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Methylfolate"]
-            ))
-            needs.append(NutrientNeed(
-                nutrient="Vitamin B12",
-                priority=1,
-                reason=f"MTHFR {variant} requires adequate B12 for proper methylation cycle function",
-                related_markers=["MTHFR", "methylation"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin B12"]
-            ))
-        elif variant == "A1298C":
+        for nutrient, priority, reason, markers in MTHFR_VARIANT_NEEDS.get(variant, ()):
             needs.append(NutrientNeed(
-                nutrient="Methylfolate",
-                priority=2,
-                reason="MTHFR A1298C variant - moderately reduced folate metabolism",
-                related_markers=["MTHFR", "BH4"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Methylfolate"]
+                nutrient=nutrient,
+                priority=priority,
+                reason=reason.format(variant=variant),
+                related_markers=markers,
+                food_sources=NUTRIENT_FOOD_SOURCES[nutrient]
             ))
     
     # COMT Analysis
@@ -137,146 +373,163 @@ def analyze_methylation_markers(lab_results: LabResults) -> List[NutrientNeed]:
                 nutrient="Magnesium",
                 priority=2,
                 reason="Slow COMT variant - magnesium supports stress response and catecholamine metabolism",
-                related_markers=["COMT", "catecholamines"],
+                related_markers=("COMT", "catecholamines"),
                 food_sources=NUTRIENT_FOOD_SOURCES["Magnesium"]
             ))
     
     return needs
 
 
-def analyze_vitamin_levels(lab_results: LabResults) -> List[NutrientNeed]:
+def analyze_vitamin_levels(lab_results: LabResults,
+                           codes: Optional[Dict[str, int]] = None) -> List[NutrientNeed]:
     """Analyze vitamin and mineral levels from lab results."""
     needs = []
+    b12_sources = NUTRIENT_FOOD_SOURCES["Vitamin B12"]
+    vitamin_d_sources = NUTRIENT_FOOD_SOURCES["Vitamin D"]
+    iron_sources = NUTRIENT_FOOD_SOURCES["Iron"]
+    if codes is None:
+        codes = classify_lab_levels(lab_results)
     
     # Vitamin B12
-    if lab_results.vitamin_b12_level is not None:
+    code = codes.get("vitamin_b12_level")
+    if code is not None:
         level = lab_results.vitamin_b12_level
         ref = LAB_REFERENCE_RANGES["vitamin_b12"]
         
-        if level < ref["low"]:
+        if code == 0:
             needs.append(NutrientNeed(
                 nutrient="Vitamin B12",
                 priority=1,
                 reason=f"B12 level ({level} {ref['unit']}) is deficient - urgent supplementation recommended",
-                related_markers=["B12", "MCV", "homocysteine"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin B12"]
+                related_markers=("B12", "MCV", "homocysteine"),
+                food_sources=b12_sources
             ))
-        elif level < ref["optimal_low"]:
+        elif code == 1:
             needs.append(NutrientNeed(
                 nutrient="Vitamin B12",
                 priority=2,
                 reason=f"B12 level ({level} {ref['unit']}) is suboptimal - dietary increase recommended",
-                related_markers=["B12"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin B12"]
+                related_markers=("B12",),
+                food_sources=b12_sources
             ))
     
     # Vitamin D
-    if lab_results.vitamin_d_level is not None:
+    code = codes.get("vitamin_d_level")
+    if code is not None:
         level = lab_results.vitamin_d_level
         ref = LAB_REFERENCE_RANGES["vitamin_d"]
         
-        if level < ref["low"]:
+        if code == 0:
             needs.append(NutrientNeed(
                 nutrient="Vitamin D",
                 priority=1,
                 reason=f"Vitamin D level ({level} {ref['unit']}) is deficient - significant health impact",
-                related_markers=["25-OH Vitamin D", "calcium", "PTH"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin D"]
+                related_markers=("25-OH Vitamin D", "calcium", "PTH"),
+                food_sources=vitamin_d_sources
             ))
-        elif level < ref["optimal_low"]:
+        elif code == 1:
             needs.append(NutrientNeed(
                 nutrient="Vitamin D",
                 priority=2,
                 reason=f"Vitamin D level ({level} {ref['unit']}) is insufficient",
-                related_markers=["25-OH Vitamin D"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin D"]
+                related_markers=("25-OH Vitamin D",),
+                food_sources=vitamin_d_sources
             ))
     
     # Iron
-    if lab_results.iron_level is not None:
+    if codes.get("iron_level") == 0:
         level = lab_results.iron_level
         ref = LAB_REFERENCE_RANGES["iron"]
-        
-        if level < ref["low"]:
-            needs.append(NutrientNeed(
-                nutrient="Iron",
-                priority=1,
-                reason=f"Iron level ({level} {ref['unit']}) is low - may cause fatigue and anemia",
-                related_markers=["serum iron", "ferritin", "TIBC"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Iron"]
-            ))
+        needs.append(NutrientNeed(
+            nutrient="Iron",
+            priority=1,
+            reason=f"Iron level ({level} {ref['unit']}) is low - may cause fatigue and anemia",
+            related_markers=("serum iron", "ferritin", "TIBC"),
+            food_sources=iron_sources
+        ))
     
     return needs
 
 
-def analyze_inflammation_markers(lab_results: LabResults) -> List[NutrientNeed]:
+def analyze_inflammation_markers(lab_results: LabResults,
+                                 codes: Optional[Dict[str, int]] = None) -> List[NutrientNeed]:
     """Analyze inflammation markers and recommend anti-inflammatory nutrients."""
     needs = []
+    anti_inflammatory_sources = NUTRIENT_FOOD_SOURCES["Anti-inflammatory Foods"]
+    omega3_sources = NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
+    methylfolate_sources = NUTRIENT_FOOD_SOURCES["Methylfolate"]
+    if codes is None:
+        codes = classify_lab_levels(lab_results)
     
     # CRP (C-Reactive Protein)
-    if lab_results.crp_level is not None:
+    code = codes.get("crp_level")
+    if code:
         level = lab_results.crp_level
         ref = LAB_REFERENCE_RANGES["crp"]
         
-        if level > ref["elevated"]:
-            priority = 1 if level > ref["high"] else 2
-            needs.append(NutrientNeed(
-                nutrient="Anti-inflammatory Foods",
-                priority=priority,
-                reason=f"CRP level ({level} {ref['unit']}) indicates systemic inflammation",
-                related_markers=["CRP", "ESR", "inflammation"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Anti-inflammatory Foods"]
-            ))
-            needs.append(NutrientNeed(
-                nutrient="Omega-3 Fatty Acids",
-                priority=priority,
-                reason=f"Omega-3s help reduce inflammation markers like CRP ({level} {ref['unit']})",
-                related_markers=["CRP", "omega-3 index"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
-            ))
+        priority = 1 if code == 2 else 2
+        needs.append(NutrientNeed(
+            nutrient="Anti-inflammatory Foods",
+            priority=priority,
+            reason=f"CRP level ({level} {ref['unit']}) indicates systemic inflammation",
+            related_markers=("CRP", "ESR", "inflammation"),
+            food_sources=anti_inflammatory_sources
+        ))
+        needs.append(NutrientNeed(
+            nutrient="Omega-3 Fatty Acids",
+            priority=priority,
+            reason=f"Omega-3s help reduce inflammation markers like CRP ({level} {ref['unit']})",
+            related_markers=("CRP", "omega-3 index"),
+            food_sources=omega3_sources
+        ))
     
     # Homocysteine
-    if lab_results.homocysteine_level is not None:
+    code = codes.get("homocysteine_level")
+    if code:
         level = lab_results.homocysteine_level
         ref = LAB_REFERENCE_RANGES["homocysteine"]
         
-        if level > ref["elevated"]:
-            priority = 1 if level > ref["high"] else 2
-            needs.append(NutrientNeed(
-                nutrient="Methylfolate",
-                priority=priority,
-                reason=f"Homocysteine ({level} {ref['unit']}) is elevated - B vitamins help lower it",
-                related_markers=["homocysteine", "cardiovascular risk"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Methylfolate"]
-            ))
+        priority = 1 if code == 2 else 2
+        needs.append(NutrientNeed(
+            nutrient="Methylfolate",
+            priority=priority,
+            reason=f"Homocysteine ({level} {ref['unit']}) is elevated - B vitamins help lower it",
+            related_markers=("homocysteine", "cardiovascular risk"),
+            food_sources=methylfolate_sources
+        ))
     
     return needs
 
 
-def analyze_metabolic_markers(lab_results: LabResults) -> List[NutrientNeed]:
+def analyze_metabolic_markers(lab_results: LabResults,
+                              codes: Optional[Dict[str, int]] = None) -> List[NutrientNeed]:
     """Analyze metabolic markers like glucose."""
     needs = []
+    fiber_sources = NUTRIENT_FOOD_SOURCES["Fiber"]
+    chromium_sources = NUTRIENT_FOOD_SOURCES["Chromium"]
+    if codes is None:
+        codes = classify_lab_levels(lab_results)
     
-    if lab_results.glucose_fasting is not None:
+    code = codes.get("glucose_fasting")
+    if code:
         level = lab_results.glucose_fasting
         ref = LAB_REFERENCE_RANGES["glucose_fasting"]
         
-        if level > ref["optimal_high"]:
-            priority = 2 if level < ref["prediabetic"] else 1
-            needs.append(NutrientNeed(
-                nutrient="Fiber",
-                priority=priority,
-                reason=f"Fasting glucose ({level} {ref['unit']}) elevated - fiber helps regulate blood sugar",
-                related_markers=["glucose", "HbA1c", "insulin"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Fiber"]
-            ))
-            needs.append(NutrientNeed(
-                nutrient="Chromium",
-                priority=priority + 1,
-                reason=f"Chromium supports glucose metabolism with elevated fasting glucose ({level})",
-                related_markers=["glucose", "insulin sensitivity"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Chromium"]
-            ))
+        priority = 2 if code == 1 else 1
+        needs.append(NutrientNeed(
+            nutrient="Fiber",
+            priority=priority,
+            reason=f"Fasting glucose ({level} {ref['unit']}) elevated - fiber helps regulate blood sugar",
+            related_markers=("glucose", "HbA1c", "insulin"),
+            food_sources=fiber_sources
+        ))
+        needs.append(NutrientNeed(
+            nutrient="Chromium",
+            priority=priority + 1,
+            reason=f"Chromium supports glucose metabolism with elevated fasting glucose ({level})",
+            related_markers=("glucose", "insulin sensitivity"),
+            food_sources=chromium_sources
+        ))
     
     return needs
 
@@ -284,67 +537,15 @@ def analyze_metabolic_markers(lab_results: LabResults) -> List[NutrientNeed]:
 def analyze_symptoms(medical: MedicalHistory) -> List[NutrientNeed]:
     """Analyze symptoms and suggest supportive nutrients."""
     needs = []
-    symptoms = [s.lower() for s in medical.current_symptoms]
-    
-    symptom_nutrient_map = {
-        "fatigue": [
-            NutrientNeed(
-                nutrient="Iron",
-                priority=3,
-                reason="Fatigue reported - iron deficiency is a common cause",
-                related_markers=["symptoms: fatigue"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Iron"]
-            ),
-            NutrientNeed(
-                nutrient="Vitamin B12",
-                priority=3,
-                reason="Fatigue reported - B12 supports energy metabolism",
-                related_markers=["symptoms: fatigue"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin B12"]
-            )
-        ],
-        "brain_fog": [
-            NutrientNeed(
-                nutrient="Omega-3 Fatty Acids",
-                priority=3,
-                reason="Brain fog reported - omega-3s support cognitive function",
-                related_markers=["symptoms: brain fog"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
-            )
-        ],
-        "joint_pain": [
-            NutrientNeed(
-                nutrient="Anti-inflammatory Foods",
-                priority=3,
-                reason="Joint pain reported - anti-inflammatory foods may help",
-                related_markers=["symptoms: joint pain"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Anti-inflammatory Foods"]
-            )
-        ],
-        "anxiety": [
-            NutrientNeed(
-                nutrient="Magnesium",
-                priority=3,
-                reason="Anxiety reported - magnesium supports nervous system calm",
-                related_markers=["symptoms: anxiety"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Magnesium"]
-            )
-        ],
-        "weak_immunity": [
-            NutrientNeed(
-                nutrient="Vitamin D",
-                priority=3,
-                reason="Immune concerns - Vitamin D is crucial for immune function",
-                related_markers=["symptoms: immunity"],
-                food_sources=NUTRIENT_FOOD_SOURCES["Vitamin D"]
-            )
-        ]
-    }
     
-    for symptom in symptoms:
-        for key, nutrient_needs in symptom_nutrient_map.items():
-            if key in symptom:
-                needs.extend(nutrient_needs)
+    for symptom in medical.current_symptoms_lc:
+        if SYMPTOM_AUTOMATON is not None:
+            matched = {key for _, key in SYMPTOM_AUTOMATON.iter(symptom)}
+        else:
+            matched = {key for key in SYMPTOM_KEYS if key in symptom}
+        for key, templates in SYMPTOM_NUTRIENT_MAP.items():
+            if key in matched:
+                needs.extend(templates)
     
     return needs
 
@@ -352,40 +553,48 @@ def analyze_symptoms(medical: MedicalHistory) -> List[NutrientNeed]:
 def analyze_family_history(medical: MedicalHistory) -> List[NutrientNeed]:
     """Analyze family history for preventive nutrition."""
     needs = []
-    history = [h.lower() for h in medical.family_history]
+    fiber_sources = NUTRIENT_FOOD_SOURCES["Fiber"]
+    chromium_sources = NUTRIENT_FOOD_SOURCES["Chromium"]
+    omega3_sources = NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
+    antioxidant_sources = NUTRIENT_FOOD_SOURCES["Antioxidants"]
+    hits = {
+        match.group()
+        for h in medical.family_history_lc
+        for match in FAMILY_HISTORY_PATTERN.finditer(h)
+    }
     
-    if any("diabetes" in h for h in history):
+    if "diabetes" in hits:
         needs.append(NutrientNeed(
             nutrient="Fiber",
             priority=4,
             reason="Family history of diabetes - fiber helps maintain healthy blood sugar",
-            related_markers=["family history: diabetes"],
-            food_sources=NUTRIENT_FOOD_SOURCES["Fiber"]
+            related_markers=("family history: diabetes",),
+            food_sources=fiber_sources
         ))
         needs.append(NutrientNeed(
             nutrient="Chromium",
             priority=4,
             reason="Family history of diabetes - chromium supports glucose metabolism",
-            related_markers=["family history: diabetes"],
-            food_sources=NUTRIENT_FOOD_SOURCES["Chromium"]
+            related_markers=("family history: diabetes",),
+            food_sources=chromium_sources
         ))
     
-    if any("heart" in h or "cardiovascular" in h for h in history):
+    if "heart" in hits or "cardiovascular" in hits:
         needs.append(NutrientNeed(
             nutrient="Omega-3 Fatty Acids",
             priority=4,
             reason="Family history of heart disease - omega-3s support cardiovascular health",
-            related_markers=["family history: cardiovascular"],
-            food_sources=NUTRIENT_FOOD_SOURCES["Omega-3 Fatty Acids"]
+            related_markers=("family history: cardiovascular",),
+            food_sources=omega3_sources
         ))
     
-    if any("cancer" in h for h in history):
+    if "cancer" in hits:
         needs.append(NutrientNeed(
             nutrient="Antioxidants",
             priority=4,
             reason="Family history considerations - antioxidants support cellular health",
-            related_markers=["family history: cancer"],
-            food_sources=NUTRIENT_FOOD_SOURCES["Antioxidants"]
+            related_markers=("family history: cancer",),
+            food_sources=antioxidant_sources
         ))
     
     return needs
@@ -398,34 +607,33 @@ def consolidate_nutrient_needs(all_needs: List[NutrientNeed]) -> List[NutrientNe
     for need in all_needs:
         if need.nutrient in nutrient_map:
             existing = nutrient_map[need.nutrient]
+            # Ordered, de-duplicated union of both marker lists
+            combined_markers = tuple(dict.fromkeys((*existing.related_markers, *need.related_markers)))
             # Keep the higher priority (lower number)
             if need.priority < existing.priority:
-                # Merge reasons and markers
-                combined_markers = list(set(existing.related_markers + need.related_markers))
-                combined_reason = f"{need.reason}; Also: {existing.reason}"
-                nutrient_map[need.nutrient] = NutrientNeed(
-                    nutrient=need.nutrient,
+                nutrient_map[need.nutrient] = existing._replace(
                     priority=need.priority,
-                    reason=combined_reason,
+                    reason=f"{need.reason}; Also: {existing.reason}",
                     related_markers=combined_markers,
                     food_sources=need.food_sources
                 )
             else:
-                # Just add markers to existing
-                existing.related_markers = list(set(existing.related_markers + need.related_markers))
+                nutrient_map[need.nutrient] = existing._replace(related_markers=combined_markers)
         else:
             nutrient_map[need.nutrient] = need
     
     return list(nutrient_map.values())
 
 
-def analyze_lab_data(user_context: UserContext) -> NutrientPriorityList:
+def analyze_lab_data(user_context: UserContext,
+                     lab_codes: Optional[Dict[str, int]] = None) -> NutrientPriorityList:
     """
     Main function: Analyze all lab data and user context to generate
     a comprehensive Nutrient Priority List.
     
     Args:
         user_context: Complete user context including lab results
+        lab_codes: Precomputed classify_lab_levels() result (computed if omitted)
         
     Returns:
         NutrientPriorityList with prioritized nutrient recommendations
@@ -433,29 +641,39 @@ def analyze_lab_data(user_context: UserContext) -> NutrientPriorityList:
     all_needs: List[NutrientNeed] = []
     warnings: List[str] = []
     
-    # Analyze lab results if available
-    if user_context.lab_results:
-        all_needs.extend(analyze_methylation_markers(user_context.lab_results))
-        all_needs.extend(analyze_vitamin_levels(user_context.lab_results))
-        all_needs.extend(analyze_inflammation_markers(user_context.lab_results))
-        all_needs.extend(analyze_metabolic_markers(user_context.lab_results))
+    # Analyze lab results if available (skipping analyzers with nothing reported to look at)
+    lab_results = user_context.lab_results
+    if lab_results:
+        if lab_codes is None:
+            lab_codes = classify_lab_levels(lab_results)
+        if lab_results.mthfr_variant or lab_results.comt_variant:
+            all_needs.extend(analyze_methylation_markers(lab_results))
+        if lab_codes:
+            all_needs.extend(analyze_vitamin_levels(lab_results, lab_codes))
+            all_needs.extend(analyze_inflammation_markers(lab_results, lab_codes))
+            all_needs.extend(analyze_metabolic_markers(lab_results, lab_codes))
     else:
         warnings.append("No lab results provided - recommendations based on symptoms and history only")
     
     # Analyze medical history
-    all_needs.extend(analyze_symptoms(user_context.medical))
-    all_needs.extend(analyze_family_history(user_context.medical))
+    medical = user_context.medical
+    if medical.current_symptoms_lc:
+        all_needs.extend(analyze_symptoms(medical))
+    if medical.family_history_lc:
+        all_needs.extend(analyze_family_history(medical))
     
     # Check for allergies that might conflict with food sources
-    allergies = [a.lower() for a in user_context.medical.known_allergies]
-    for need in all_needs:
-        filtered_sources = []
-        for source in need.food_sources:
-            if not any(allergy in source.lower() for allergy in allergies):
-                filtered_sources.append(source)
-        need.food_sources = filtered_sources
-        if not filtered_sources:
-            warnings.append(f"Limited food sources for {need.nutrient} due to allergies")
+    # (every need draws its sources from NUTRIENT_FOOD_SOURCES, so filter per nutrient, cached;
+    # without allergies the shared tuples are used as-is)
+    allergies = tuple(sorted(set(user_context.medical.known_allergies_lc)))
+    if allergies:
+        filtered_needs = []
+        for need in all_needs:
+            filtered_sources = filter_food_sources(need.nutrient, allergies)
+            if not filtered_sources:
+                warnings.append(f"Limited food sources for {need.nutrient} due to allergies")
+            filtered_needs.append(need._replace(food_sources=filtered_sources))
+        all_needs = filtered_needs
     
     # Consolidate and sort
     consolidated_needs = consolidate_nutrient_needs(all_needs)
@@ -468,23 +686,38 @@ def analyze_lab_data(user_context: UserContext) -> NutrientPriorityList:
     )
 
 
+def analyze_lab_data_batch(contexts: List[UserContext]) -> List[NutrientPriorityList]:
+    """
+    Analyze many users at once (e.g. a clinic's intake list).
+    Lab levels for the whole batch are classified together, then each user's
+    priority list is assembled exactly as analyze_lab_data would.
+    """
+    lab_codes = classify_lab_matrix([c.lab_results for c in contexts])
+    return [analyze_lab_data(c, codes) for c, codes in zip(contexts, lab_codes)]
+
+
 def print_nutrient_report(priority_list: NutrientPriorityList) -> None:
     """Print a formatted nutrient priority report."""
-    print("\n" + "="*60)
-    print("  NUTRIENT PRIORITY ANALYSIS REPORT")
-    print("="*60)
+    lines = [
+        "\n" + "="*60,
+        "  NUTRIENT PRIORITY ANALYSIS REPORT",
+        "="*60,
+    ]
     
     if priority_list.warnings:
-        print("\n⚠️  WARNINGS:")
+        lines.append("\n⚠️  WARNINGS:")
         for warning in priority_list.warnings:
-            print(f"   - {warning}")
+            lines.append(f"   - {warning}")
     
-    print("\n📊 PRIORITIZED NUTRIENT NEEDS:\n")
+    lines.append("\n📊 PRIORITIZED NUTRIENT NEEDS:\n")
     
     for i, need in enumerate(priority_list.needs, 1):
-        priority_label = ["🔴 CRITICAL", "🟠 HIGH", "🟡 MODERATE", "🟢 PREVENTIVE", "⚪ SUPPORTIVE"][min(need.priority - 1, 4)]
-        print(f"{i}. {need.nutrient} [{priority_label}]")
-        print(f"   Reason: {need.reason}")
-        print(f"   Markers: {', '.join(need.related_markers[:3])}")
-        print(f"   Food Sources: {', '.join(need.food_sources[:4])}")
-        print()
+        priority_label = PRIORITY_LABELS[min(need.priority - 1, 4)]
+        lines.append(f"{i}. {need.nutrient} [{priority_label}]")
+        lines.append(f"   Reason: {need.reason}")
+        lines.append(f"   Markers: {', '.join(need.related_markers[:3])}")
+        lines.append(f"   Food Sources: {', '.join(need.food_sources[:4])}")
+        lines.append("")
+    
+    # One write for the whole report instead of a print() per line
+    sys.stdout.write("\n".join(lines) + "\n")
@@ -4,36 +4,23 @@ CLI loop where users can ask 'Why was this chosen?' and get AI explanations.
 """
 
 import re
-from typing import Optional, List, Tuple
+import sys
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Optional, List, Tuple
 
 from user_context import UserContext
-from bio_analyzer import NutrientPriorityList, NutrientNeed
+from bio_analyzer import NutrientPriorityList, NutrientNeed, PRIORITY_LABELS
 from shopping_planner import ShoppingList, ShoppingListItem, get_item_explanation
 
 
-class InteractiveCLI:
+# Static CLI copy, built once at import
+HELP_TEXT = "\n".join([
+    "\n" + "-"*50,
+    "  INTERACTIVE ASSISTANT - Commands",
+    "-"*50,
     """
-    Interactive command-line interface for exploring recommendations.
-    Allows users to ask "Why?" about their personalized food recommendations.
-    """
-    
-    def __init__(
-        self,
-        user_context: UserContext,
-        nutrient_priorities: NutrientPriorityList,
-        shopping_list: ShoppingList
-    ):
-        self.user = user_context
-        self.nutrients = nutrient_priorities
-        self.shopping = shopping_list
-        self.running = False
-    
-    def show_help(self) -> None:
-        """Display available commands."""
-        print("\n" + "-"*50)
-        print("  INTERACTIVE ASSISTANT - Commands")
-        print("-"*50)
-        print("""
   why [item]     - Explain why an item was recommended
                    Example: 'why spinach' or 'why eggs'
   
@@ -53,22 +40,137 @@ class InteractiveCLI:
   help           - Show this help message
   
   quit / exit    - Exit the interactive session
-""")
+""",
+])
+
+MARKERS_HEADER = "\n🧬 YOUR METHYLATION & LAB MARKERS ANALYSIS\n" + "="*50
+NO_LABS_NOTE = """
+   No lab results on file.
+   Recommendations are based on symptoms and history only."""
+MTHFR_DETAIL = """
+      → Impact: Affects folate metabolism and methylation cycle
+      → Action: Prioritize methylfolate and B12 from food"""
+COMT_SLOW_DETAIL = """
+      → Impact: Slower catecholamine breakdown
+      → Action: Support with magnesium, limit stimulants"""
+
+# Two-way lab value rows for the markers view:
+# (label, LabResults field, unit, threshold, flag when below (else above), flagged status, normal status)
+LAB_VALUE_ROWS = (
+    ("Vitamin B12", "vitamin_b12_level", "pg/mL", 500, True, "Low ⚠️", "Adequate ✓"),
+    ("Vitamin D", "vitamin_d_level", "ng/mL", 30, True, "Deficient ⚠️", "Adequate ✓"),
+    ("Iron", "iron_level", "mcg/dL", 60, True, "Low ⚠️", "Adequate ✓"),
+    ("CRP (Inflammation)", "crp_level", "mg/L", 1, False, "Elevated ⚠️", "Normal ✓"),
+    ("Homocysteine", "homocysteine_level", "umol/L", 10, False, "Elevated ⚠️", "Normal ✓"),
+)
+
+WELCOME_TEMPLATE = """
+{rule}
+  INTERACTIVE FEEDBACK SESSION
+{rule}
+
+  Welcome, {name}!
+  Ask me about your personalized nutrition recommendations.
+  Type 'help' for commands or 'why [item]' to learn more.
+  Type 'quit' to exit.
+
+"""
+
+
+def build_name_index(names_lower: List[str]) -> Dict[str, int]:
+    """
+    Map each lowercased full name, its part before '(' and each word to the position of the
+    first name containing it - the same answer a linear substring scan gives, in one dict probe.
+    """
+    index = {}
+    for name in names_lower:
+        for key in (name, name.split('(')[0].strip(), *name.split()):
+            if key and key not in index:
+                index[key] = next(i for i, other in enumerate(names_lower) if key in other)
+    return index
+
+
+class InteractiveCLI:
+    """
+    Interactive command-line interface for exploring recommendations.
+    Allows users to ask "Why?" about their personalized food recommendations.
+    """
+    
+    def __init__(
+        self,
+        user_context: UserContext,
+        nutrient_priorities: NutrientPriorityList,
+        shopping_list: ShoppingList
+    ):
+        self.user = user_context
+        self.nutrients = nutrient_priorities
+        self.shopping = shopping_list
+        self.running = False
+        
+        # User context views read by the show_*/explain_* methods; fixed for the session
+        self._lab = user_context.lab_results
+        self._fin = user_context.financials
+        self._symptoms = user_context.medical.current_symptoms
+        self._symptoms_lc = user_context.medical.current_symptoms_lc
+        
+        # Lowercased names for partial-match lookups, computed once per session
+        self._item_names_lower = [item.food.name.lower() for item in shopping_list.items]
+        self._pantry_names_lower = [item.food.name.lower() for item in shopping_list.pantry_items]
+        self._nutrient_names_lower = [need.nutrient.lower() for need in nutrient_priorities.needs]
+        self._item_index = build_name_index(self._item_names_lower)
+        self._nutrient_index = build_name_index(self._nutrient_names_lower)
+        # `list` and `nutrients` replies, formatted once
+        self._list_output = "\n".join([
+            "\n📋 YOUR SHOPPING LIST:",
+            *(f"   {i}. {item.food.name} - ${item.estimated_cost:.2f}"
+              for i, item in enumerate(shopping_list.items, 1)),
+        ])
+        self._nutrients_output = "\n".join([
+            "\n🔬 YOUR NUTRIENT PRIORITIES:",
+            *(f"   {i}. {need.nutrient} [Priority {need.priority}]"
+              for i, need in enumerate(nutrient_priorities.needs, 1)),
+        ])
+        # Tab-completion candidates: command words plus item and nutrient names
+        self._completions = sorted(
+            set(self.COMMANDS) | set(self._item_names_lower) | set(self._nutrient_names_lower)
+        )
+        self._matches: List[str] = []
+        # Short display names for store tips ("Sardines (canned)" -> "Sardines"), keyed by item identity
+        self._display_names = {
+            id(item): item.food.name.split('(')[0].strip() for item in shopping_list.items
+        }
+        
+        # Nothing changes during a session, so repeat questions are answered from a per-instance cache
+        self.explain_item = lru_cache(maxsize=256)(self.explain_item)
+        self.explain_nutrient = lru_cache(maxsize=256)(self.explain_nutrient)
+        self.show_markers_analysis = lru_cache(maxsize=None)(self.show_markers_analysis)
+        self.show_budget_breakdown = lru_cache(maxsize=None)(self.show_budget_breakdown)
+        self.show_store_tips = lru_cache(maxsize=None)(self.show_store_tips)
+    
+    def show_help(self) -> str:
+        """Return the available-commands help text."""
+        return HELP_TEXT
     
     def find_item_by_name(self, search: str) -> Optional[ShoppingListItem]:
         """Find a shopping list item by partial name match."""
         search_lower = search.lower()
-        for item in self.shopping.items:
-            if search_lower in item.food.name.lower():
-                return item
+        i = self._item_index.get(search_lower)
+        if i is not None:
+            return self.shopping.items[i]
+        for i, name_lower in enumerate(self._item_names_lower):
+            if search_lower in name_lower:
+                return self.shopping.items[i]
         return None
     
     def find_nutrient_need(self, search: str) -> Optional[NutrientNeed]:
         """Find a nutrient need by partial name match."""
         search_lower = search.lower()
-        for need in self.nutrients.needs:
-            if search_lower in need.nutrient.lower():
-                return need
+        i = self._nutrient_index.get(search_lower)
+        if i is not None:
+            return self.nutrients.needs[i]
+        for i, name_lower in enumerate(self._nutrient_names_lower):
+            if search_lower in name_lower:
+                return self.nutrients.needs[i]
         return None
     
     def explain_item(self, item_name: str) -> str:
@@ -77,17 +179,18 @@ class InteractiveCLI:
         
         if not item:
             # Check pantry items too
-            for pantry_item in self.shopping.pantry_items:
-                if item_name.lower() in pantry_item.food.name.lower():
+            item_name_lower = item_name.lower()
+            for pantry_item, name_lower in zip(self.shopping.pantry_items, self._pantry_names_lower):
+                if item_name_lower in name_lower:
                     return (
                         f"📦 {pantry_item.food.name}\n"
                         f"   Source: Food Pantry (FREE)\n"
                         f"   This was recommended because your budget tier is "
-                        f"'{self.user.financials.budget_tier}'.\n"
+                        f"'{self._fin.budget_tier}'.\n"
                         f"   Food pantries provide essential nutrition at no cost."
                     )
             
-            available_items = [i.food.name for i in self.shopping.items[:8]]
+            available_items = [i.food.name for i in islice(self.shopping.items, 8)]
             return (
                 f"❓ Item '{item_name}' not found in your shopping list.\n"
                 f"   Available items: {', '.join(available_items)}"
@@ -100,7 +203,7 @@ class InteractiveCLI:
         need = self.find_nutrient_need(nutrient_name)
         
         if not need:
-            available = [n.nutrient for n in self.nutrients.needs[:6]]
+            available = [n.nutrient for n in islice(self.nutrients.needs, 6)]
             return (
                 f"❓ Nutrient '{nutrient_name}' not found in your priorities.\n"
                 f"   Your priority nutrients: {', '.join(available)}"
@@ -108,8 +211,7 @@ class InteractiveCLI:
         
         explanation = []
         explanation.append(f"🔬 {need.nutrient}")
-        explanation.append(f"\n   Priority Level: {need.priority} " + 
-                          ["🔴 CRITICAL", "🟠 HIGH", "🟡 MODERATE", "🟢 PREVENTIVE", "⚪ SUPPORTIVE"][min(need.priority-1, 4)])
+        explanation.append(f"\n   Priority Level: {need.priority} " + PRIORITY_LABELS[min(need.priority-1, 4)])
         explanation.append(f"\n   ➤ Why this matters for you:")
         explanation.append(f"     {need.reason}")
         
@@ -119,13 +221,12 @@ class InteractiveCLI:
                 explanation.append(f"      • {marker}")
         
         # Show connection to symptoms/history
-        symptoms = self.user.medical.current_symptoms
-        history = self.user.medical.family_history
-        
-        matching_symptoms = [s for s in symptoms if any(
-            s.lower() in marker.lower() or marker.lower() in s.lower() 
-            for marker in need.related_markers
-        )]
+        # (symptoms are lowercased once on MedicalHistory; markers once here, not per pair)
+        markers_lower = [marker.lower() for marker in need.related_markers]
+        matching_symptoms = [
+            s for s, s_lower in zip(self._symptoms, self._symptoms_lc)
+            if any(s_lower in marker or marker in s_lower for marker in markers_lower)
+        ]
         
         if matching_symptoms:
             explanation.append(f"\n   🩺 Connected to your symptoms:")
@@ -141,53 +242,29 @@ class InteractiveCLI:
     
     def show_markers_analysis(self) -> str:
         """Show methylation and lab markers analysis."""
-        output = []
-        output.append("\n🧬 YOUR METHYLATION & LAB MARKERS ANALYSIS")
-        output.append("="*50)
-        
-        lab = self.user.lab_results
+        lab = self._lab
         if not lab:
-            output.append("\n   No lab results on file.")
-            output.append("   Recommendations are based on symptoms and history only.")
-            return "\n".join(output)
+            return "\n".join((MARKERS_HEADER, NO_LABS_NOTE))
         
-        # Methylation markers
-        output.append("\n📍 METHYLATION MARKERS:")
+        # Methylation markers (fixed text blocks, one entry per marker)
+        output = [MARKERS_HEADER, "\n📍 METHYLATION MARKERS:"]
         if lab.mthfr_variant:
-            output.append(f"   MTHFR: {lab.mthfr_variant}")
-            output.append(f"      → Impact: Affects folate metabolism and methylation cycle")
-            output.append(f"      → Action: Prioritize methylfolate and B12 from food")
+            output.append(f"   MTHFR: {lab.mthfr_variant}{MTHFR_DETAIL}")
         else:
             output.append("   MTHFR: Not tested/Normal")
         
         if lab.comt_variant:
-            output.append(f"   COMT: {lab.comt_variant}")
-            if lab.comt_variant.lower() == "slow":
-                output.append(f"      → Impact: Slower catecholamine breakdown")
-                output.append(f"      → Action: Support with magnesium, limit stimulants")
+            comt_detail = COMT_SLOW_DETAIL if lab.comt_variant.lower() == "slow" else ""
+            output.append(f"   COMT: {lab.comt_variant}{comt_detail}")
         
         # Key lab values
         output.append("\n📊 KEY LAB VALUES:")
         
-        if lab.vitamin_b12_level:
-            status = "Low ⚠️" if lab.vitamin_b12_level < 500 else "Adequate ✓"
-            output.append(f"   Vitamin B12: {lab.vitamin_b12_level} pg/mL [{status}]")
-        
-        if lab.vitamin_d_level:
-            status = "Deficient ⚠️" if lab.vitamin_d_level < 30 else "Adequate ✓"
-            output.append(f"   Vitamin D: {lab.vitamin_d_level} ng/mL [{status}]")
-        
-        if lab.iron_level:
-            status = "Low ⚠️" if lab.iron_level < 60 else "Adequate ✓"
-            output.append(f"   Iron: {lab.iron_level} mcg/dL [{status}]")
-        
-        if lab.crp_level:
-            status = "Elevated ⚠️" if lab.crp_level > 1 else "Normal ✓"
-            output.append(f"   CRP (Inflammation): {lab.crp_level} mg/L [{status}]")
-        
-        if lab.homocysteine_level:
-            status = "Elevated ⚠️" if lab.homocysteine_level > 10 else "Normal ✓"
-            output.append(f"   Homocysteine: {lab.homocysteine_level} umol/L [{status}]")
+        for label, attr, unit, threshold, low_is_flagged, flagged, normal in LAB_VALUE_ROWS:
+            value = getattr(lab, attr)
+            if value:
+                is_flagged = value < threshold if low_is_flagged else value > threshold
+                output.append(f"   {label}: {value} {unit} [{flagged if is_flagged else normal}]")
         
         if lab.glucose_fasting:
             if lab.glucose_fasting >= 126:
@@ -207,37 +284,37 @@ class InteractiveCLI:
     
     def show_budget_breakdown(self) -> str:
         """Show budget allocation."""
+        financials = self._fin
+        shopping = self.shopping
+        total_cost = shopping.total_estimated_cost
+        
         output = []
         output.append("\n💰 BUDGET BREAKDOWN")
         output.append("="*50)
         
-        budget = self.user.financials.weekly_budget
-        output.append(f"\n   Weekly Budget: ${budget:.2f}")
-        output.append(f"   Budget Tier: {self.user.financials.budget_tier.upper()}")
+        output.append(f"\n   Weekly Budget: ${financials.weekly_budget:.2f}")
+        output.append(f"   Budget Tier: {financials.budget_tier.upper()}")
         
-        if self.user.financials.snap_status:
+        if financials.snap_status:
             output.append("   ✓ SNAP benefits - EBT accepted items prioritized")
-        if self.user.financials.wic_status:
+        if financials.wic_status:
             output.append("   ✓ WIC benefits - eligible items noted")
         
-        output.append(f"\n   Estimated Shopping Cost: ${self.shopping.total_estimated_cost:.2f}")
-        output.append(f"   Budget Remaining: ${self.shopping.budget_remaining:.2f}")
+        output.append(f"\n   Estimated Shopping Cost: ${total_cost:.2f}")
+        output.append(f"   Budget Remaining: ${shopping.budget_remaining:.2f}")
         
         # Breakdown by priority
-        priority_costs = {}
-        for item in self.shopping.items:
-            p = item.priority.name
-            if p not in priority_costs:
-                priority_costs[p] = 0
-            priority_costs[p] += item.estimated_cost
+        priority_costs = defaultdict(float)
+        for item in shopping.items:
+            priority_costs[item.priority.name] += item.estimated_cost
         
         output.append("\n   Cost by Priority:")
         for priority, cost in priority_costs.items():
-            pct = (cost / self.shopping.total_estimated_cost * 100) if self.shopping.total_estimated_cost > 0 else 0
+            pct = (cost / total_cost * 100) if total_cost > 0 else 0
             output.append(f"      {priority}: ${cost:.2f} ({pct:.0f}%)")
         
-        if self.shopping.pantry_items:
-            output.append(f"\n   🆓 Plus {len(self.shopping.pantry_items)} items from food pantry (FREE)")
+        if shopping.pantry_items:
+            output.append(f"\n   🆓 Plus {len(shopping.pantry_items)} items from food pantry (FREE)")
         
         return "\n".join(output)
     
@@ -247,15 +324,71 @@ class InteractiveCLI:
         output.append("\n🏪 STORE RECOMMENDATIONS")
         output.append("="*50)
         
+        display_names = self._display_names
         for store, items in self.shopping.store_visits.items():
             total = sum(i.estimated_cost for i in items)
-            item_names = [i.food.name.split('(')[0].strip() for i in items[:3]]
+            item_names = [display_names[id(i)] for i in items[:3]]
             output.append(f"\n   📍 {store}")
             output.append(f"      Items: {', '.join(item_names)}")
             output.append(f"      Est. Total: ${total:.2f}")
         
         return "\n".join(output)
     
+    # Command handlers: each takes the (possibly empty) argument and returns (should_continue, response)
+    def _cmd_quit(self, argument: str) -> Tuple[bool, str]:
+        """End the session."""
+        return False, "Thank you for using the Health Equity App! Stay healthy! 🌱"
+    
+    def _cmd_help(self, argument: str) -> Tuple[bool, str]:
+        """Show the command help."""
+        return True, self.show_help()
+    
+    def _cmd_why(self, argument: str) -> Tuple[bool, str]:
+        """Explain why an item was recommended."""
+        if not argument:
+            return True, "Please specify an item. Example: 'why spinach'"
+        return True, self.explain_item(argument)
+    
+    def _cmd_explain(self, argument: str) -> Tuple[bool, str]:
+        """Explain a nutrient need."""
+        if not argument:
+            return True, "Please specify a nutrient. Example: 'explain B12'"
+        return True, self.explain_nutrient(argument)
+    
+    def _cmd_list(self, argument: str) -> Tuple[bool, str]:
+        """Show the shopping list."""
+        return True, self._list_output
+    
+    def _cmd_nutrients(self, argument: str) -> Tuple[bool, str]:
+        """Show the nutrient priorities."""
+        return True, self._nutrients_output
+    
+    def _cmd_markers(self, argument: str) -> Tuple[bool, str]:
+        """Show the markers analysis."""
+        return True, self.show_markers_analysis()
+    
+    def _cmd_budget(self, argument: str) -> Tuple[bool, str]:
+        """Show the budget breakdown."""
+        return True, self.show_budget_breakdown()
+    
+    def _cmd_stores(self, argument: str) -> Tuple[bool, str]:
+        """Show store recommendations."""
+        return True, self.show_store_tips()
+    
+    COMMANDS = {
+        'quit': _cmd_quit,
+        'exit': _cmd_quit,
+        'q': _cmd_quit,
+        'help': _cmd_help,
+        'why': _cmd_why,
+        'explain': _cmd_explain,
+        'list': _cmd_list,
+        'nutrients': _cmd_nutrients,
+        'markers': _cmd_markers,
+        'budget': _cmd_budget,
+        'stores': _cmd_stores,
+    }
+    
     def process_command(self, user_input: str) -> Tuple[bool, str]:
         """
         Process a user command and return (should_continue, response).
@@ -265,59 +398,13 @@ class InteractiveCLI:
         if not user_input:
             return True, "Type 'help' for available commands."
         
-        # Parse command and argument
-        parts = user_input.split(maxsplit=1)
-        command = parts[0]
-        argument = parts[1] if len(parts) > 1 else ""
-        
-        # Exit commands
-        if command in ['quit', 'exit', 'q']:
-            return False, "Thank you for using the Health Equity App! Stay healthy! 🌱"
-        
-        # Help
-        if command == 'help':
-            self.show_help()
-            return True, ""
-        
-        # Why command
-        if command == 'why':
-            if not argument:
-                return True, "Please specify an item. Example: 'why spinach'"
-            return True, self.explain_item(argument)
-        
-        # Explain nutrient
-        if command == 'explain':
-            if not argument:
-                return True, "Please specify a nutrient. Example: 'explain B12'"
-            return True, self.explain_nutrient(argument)
-        
-        # Show list
-        if command == 'list':
-            output = []
-            output.append("\n📋 YOUR SHOPPING LIST:")
-            for i, item in enumerate(self.shopping.items, 1):
-                output.append(f"   {i}. {item.food.name} - ${item.estimated_cost:.2f}")
-            return True, "\n".join(output)
-        
-        # Show nutrients
-        if command == 'nutrients':
-            output = []
-            output.append("\n🔬 YOUR NUTRIENT PRIORITIES:")
-            for i, need in enumerate(self.nutrients.needs, 1):
-                output.append(f"   {i}. {need.nutrient} [Priority {need.priority}]")
-            return True, "\n".join(output)
-        
-        # Show markers
-        if command == 'markers':
-            return True, self.show_markers_analysis()
-        
-        # Budget breakdown
-        if command == 'budget':
-            return True, self.show_budget_breakdown()
-        
-        # Store tips
-        if command == 'stores':
-            return True, self.show_store_tips()
+        # Parse command and argument (partition avoids building a list for one-word commands)
+        command, _, argument = user_input.partition(' ')
+        argument = argument.lstrip()
+        
+        handler = self.COMMANDS.get(command)
+        if handler is not None:
+            return handler(self, argument)
         
         # Unknown command - try to interpret as "why X"
         if self.find_item_by_name(command):
@@ -325,15 +412,30 @@ class InteractiveCLI:
         
         return True, f"❓ Unknown command: '{command}'. Type 'help' for options."
     
+    def _complete(self, text: str, state: int) -> Optional[str]:
+        """readline completer: return the state-th candidate starting with text."""
+        if state == 0:
+            text_lower = text.lower()
+            self._matches = [c for c in self._completions if c.startswith(text_lower)]
+        return self._matches[state] if state < len(self._matches) else None
+    
+    def enable_line_editing(self) -> None:
+        """Turn on input history and tab completion where readline is available."""
+        try:
+            import readline  # Not available on Windows
+        except ImportError:
+            return
+        readline.set_completer(self._complete)
+        readline.parse_and_bind('tab: complete')
+    
     def run(self) -> None:
         """Run the interactive CLI loop."""
-        print("\n" + "="*60)
-        print("  INTERACTIVE FEEDBACK SESSION")
-        print("="*60)
-        print(f"\n  Welcome, {self.user.name}!")
-        print("  Ask me about your personalized nutrition recommendations.")
-        print("  Type 'help' for commands or 'why [item]' to learn more.")
-        print("  Type 'quit' to exit.\n")
+        if sys.stdin.isatty():
+            self.enable_line_editing()
+        
+        # No explicit flushes: input() flushes stdout before each read, so piped or scripted
+        # runs get one flush per turn instead of one per write
+        sys.stdout.write(WELCOME_TEMPLATE.format(rule="="*60, name=self.user.name))
         
         self.running = True
         
@@ -343,7 +445,8 @@ class InteractiveCLI:
                 should_continue, response = self.process_command(user_input)
                 
                 if response:
-                    print(response)
+                    # One write per command rather than one per line
+                    sys.stdout.write(response + "\n")
                 
                 if not should_continue:
                     self.running = False
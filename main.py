@@ -25,32 +25,12 @@ Usage:
 import sys
 import argparse
 
-# Import all modules
-from user_context import (
-    UserContext, 
-    Financials, 
-    Logistics, 
-    MedicalHistory, 
-    LabResults,
-    collect_user_context_cli,
-    create_sample_user
-)
-from bio_analyzer import (
-    analyze_lab_data, 
-    print_nutrient_report,
-    NutrientPriorityList
-)
-from resource_locator import (
-    resource_locator, 
-    print_resource_map,
-    ResourceMap
-)
-from shopping_planner import (
-    generate_shopping_list, 
-    print_shopping_list,
-    ShoppingList
-)
-from interactive_cli import run_interactive_session
+from typing import TYPE_CHECKING
+
+# Pipeline modules are imported inside the functions that use them, so argparse-only
+# paths (--help) start without loading them
+if TYPE_CHECKING:
+    from user_context import UserContext
 
 
 def print_banner():
@@ -68,13 +48,17 @@ def print_banner():
     print(banner)
 
 
-def run_full_analysis(user: UserContext) -> tuple:
+def run_full_analysis(user: "UserContext") -> tuple:
     """
     Run the complete analysis pipeline.
     
     Returns:
         Tuple of (NutrientPriorityList, ResourceMap, ShoppingList)
     """
+    from bio_analyzer import analyze_lab_data, print_nutrient_report
+    from resource_locator import resource_locator, print_resource_map
+    from shopping_planner import generate_shopping_list, print_shopping_list
+    
     print("\n" + "─"*60)
     print("  PHASE 2: Analyzing Biological Needs...")
     print("─"*60)
@@ -104,6 +88,9 @@ def run_full_analysis(user: UserContext) -> tuple:
 
 def demo_mode():
     """Run the app with sample data for demonstration."""
+    from user_context import create_sample_user
+    from interactive_cli import run_interactive_session
+    
     print_banner()
     print("  Running in DEMO MODE with sample user data...")
     print("  (Use --interactive flag for real questionnaire input)")
@@ -115,31 +102,36 @@ def demo_mode():
     print("  PHASE 1: User Context Summary")
     print("─"*60)
     
+    financials = user.financials
+    logistics = user.logistics
+    medical = user.medical
+    labs = user.lab_results
+    
     print(f"""
     👤 User: {user.name}
     
     💰 FINANCIAL:
-       Budget: ${user.financials.weekly_budget}/week ({user.financials.budget_tier})
-       SNAP: {'Yes ✓' if user.financials.snap_status else 'No'}
-       WIC: {'Yes ✓' if user.financials.wic_status else 'No'}
+       Budget: ${financials.weekly_budget}/week ({financials.budget_tier})
+       SNAP: {'Yes ✓' if financials.snap_status else 'No'}
+       WIC: {'Yes ✓' if financials.wic_status else 'No'}
     
     🚗 LOGISTICS:
-       Location: ZIP {user.logistics.zip_code}
-       Vehicle: {'Yes' if user.logistics.has_vehicle else 'No'}
-       Transit: {'Yes' if user.logistics.has_public_transit else 'No'}
-       Mobility: {user.logistics.mobility_level.upper()}
+       Location: ZIP {logistics.zip_code}
+       Vehicle: {'Yes' if logistics.has_vehicle else 'No'}
+       Transit: {'Yes' if logistics.has_public_transit else 'No'}
+       Mobility: {logistics.mobility_level.upper()}
     
     🩺 MEDICAL:
-       Family History: {', '.join(user.medical.family_history) or 'None reported'}
-       Previous Conditions: {', '.join(user.medical.previous_conditions) or 'None'}
-       Current Symptoms: {', '.join(user.medical.current_symptoms) or 'None'}
-       Allergies: {', '.join(user.medical.known_allergies) or 'None'}
+       Family History: {', '.join(medical.family_history) or 'None reported'}
+       Previous Conditions: {', '.join(medical.previous_conditions) or 'None'}
+       Current Symptoms: {', '.join(medical.current_symptoms) or 'None'}
+       Allergies: {', '.join(medical.known_allergies) or 'None'}
     
     🧬 LAB RESULTS:
-       MTHFR Variant: {user.lab_results.mthfr_variant or 'Not tested'}
-       B12: {user.lab_results.vitamin_b12_level} pg/mL
-       Vitamin D: {user.lab_results.vitamin_d_level} ng/mL
-       CRP (Inflammation): {user.lab_results.crp_level} mg/L
+       MTHFR Variant: {labs.mthfr_variant or 'Not tested'}
+       B12: {labs.vitamin_b12_level} pg/mL
+       Vitamin D: {labs.vitamin_d_level} ng/mL
+       CRP (Inflammation): {labs.crp_level} mg/L
     """)
     
     # Run full analysis
@@ -155,6 +147,9 @@ def demo_mode():
 
 def interactive_mode():
     """Run the app with user questionnaire input."""
+    from user_context import LabResults, collect_user_context_cli
+    from interactive_cli import run_interactive_session
+    
     print_banner()
     print("  Running in INTERACTIVE MODE")
     print("  Please answer the following questions...\n")
@@ -3,12 +3,19 @@ Phase 3: Geographic & Financial Mapping
 ResourceLocator function with synthetic store data and travel feasibility.
 """
 
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from operator import attrgetter
+from typing import FrozenSet, List, Dict, Optional, Tuple
 from enum import Enum
 from user_context import UserContext, Logistics
 
 
+# Store/TravelFeasibility/ResourceMap drop their per-instance __dict__ where dataclasses support it (3.10+)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
 class StoreType(Enum):
     GROCERY = "grocery"
     FOOD_PANTRY = "food_pantry"
@@ -23,7 +30,42 @@ class InventoryLevel(Enum):
     LOW = "low"
 
 
-@dataclass
+# Accessibility score per inventory level, indexed by Store.inventory_idx
+INVENTORY_LEVEL_INDEX: Dict[InventoryLevel, int] = {
+    InventoryLevel.HIGH: 0,
+    InventoryLevel.MEDIUM: 1,
+    InventoryLevel.LOW: 2,
+}
+INVENTORY_SCORES: Tuple[float, ...] = (1.0, 0.7, 0.4)
+
+# Keywords for different food categories
+ITEM_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "produce": ("produce", "fresh", "farmers", "organic"),
+    "spinach": ("produce", "fresh", "organic", "leafy"),
+    "eggs": ("eggs", "dairy", "fresh", "farmers"),
+    "fish": ("fresh", "specialty", "salmon", "seafood"),
+    "salmon": ("fresh", "specialty", "seafood"),
+    "beans": ("bulk", "canned", "staples", "basic"),
+    "lentils": ("bulk", "specialty", "organic"),
+    "nuts": ("bulk", "specialty", "snacks"),
+    "supplements": ("supplements", "specialty", "health"),
+}
+
+# (speed in mph, overhead in minutes) per travel method
+TRAVEL_SPEEDS: Dict[str, Tuple[float, int]] = {
+    "walk": (3.0, 5),  # plus round trip buffer
+    "transit": (12.0, 10),  # average speed, plus wait time
+    "drive": (25.0, 0),  # average with traffic
+}
+
+
+def calculate_travel_time(distance_miles: float, method: str) -> int:
+    """Calculate estimated travel time in minutes."""
+    speed, overhead = TRAVEL_SPEEDS.get(method, (3.0, 0))
+    return int((distance_miles / speed) * 60 + overhead)
+
+
+@dataclass(**_SLOTS)
 class Store:
     """Represents a nearby store/resource."""
     name: str
@@ -35,13 +77,41 @@ class Store:
     price_tier: int  # 1=cheapest, 5=most expensive
     specialty_items: List[str] = field(default_factory=list)
     hours: str = "9am-9pm"
+    # Derived once from the static fields above, for the per-user filters and sorts
+    is_food_pantry: bool = field(init=False, repr=False, compare=False)
+    price_sort_key: Tuple[int, float] = field(init=False, repr=False, compare=False)
+    specialty_text: str = field(init=False, repr=False, compare=False)
+    inventory_idx: int = field(init=False, repr=False, compare=False)
+    keyword_items: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    travel_minutes: Dict[str, int] = field(init=False, repr=False, compare=False)
+    store_notes: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.is_food_pantry = self.store_type is StoreType.FOOD_PANTRY
+        self.price_sort_key = (self.price_tier, self.distance_miles)
+        self.specialty_text = " ".join(self.specialty_items).lower()
+        self.inventory_idx = INVENTORY_LEVEL_INDEX[self.inventory_level]
+        # ITEM_KEYWORDS items whose keywords appear in this store's specialty text
+        self.keyword_items = frozenset(
+            item for item, keywords in ITEM_KEYWORDS.items()
+            if any(kw in self.specialty_text for kw in keywords)
+        )
+        # Travel time by each method; distance is fixed, so this is per store, not per user
+        self.travel_minutes = {
+            method: calculate_travel_time(self.distance_miles, method) for method in TRAVEL_SPEEDS
+        }
+        # Feasibility notes that depend only on the store, shared by every user's feasibility
+        self.store_notes = (
+            (("FREE - Food pantry",) if self.is_food_pantry else ())
+            + (("Very close",) if self.distance_miles <= 1.0 else ())
+        )
     
     @property
     def is_food_assistance_friendly(self) -> bool:
         return self.snap_accepted or self.wic_accepted
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class TravelFeasibility:
     """Calculated travel feasibility for a store."""
     store: Store
@@ -49,17 +119,22 @@ class TravelFeasibility:
     travel_method: str  # "walk", "transit", "drive"
     estimated_time_minutes: int
     accessibility_score: float  # 0-1, higher is better
-    notes: List[str] = field(default_factory=list)
+    notes: Tuple[str, ...] = ()
+    # Ranking key for accessible stores: best score first, then nearest
+    sort_key: Tuple[float, float] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.sort_key = (-self.accessibility_score, self.store.distance_miles)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ResourceMap:
     """Complete resource mapping for a user."""
     user_zip: str
-    accessible_stores: List[TravelFeasibility]
-    food_pantries: List[TravelFeasibility]
-    snap_stores: List[TravelFeasibility]
-    all_stores: List[Store]
+    accessible_stores: Tuple[TravelFeasibility, ...]
+    food_pantries: Tuple[TravelFeasibility, ...]
+    snap_stores: Tuple[TravelFeasibility, ...]
+    all_stores: Tuple[Store, ...]
 
 
 # Synthetic store database - simulates real-world data
@@ -207,55 +282,51 @@ SYNTHETIC_STORES_DATABASE: Dict[str, List[Store]] = {
 }
 
 
-def get_stores_for_zip(zip_code: str) -> List[Store]:
+# Merged store lists (default stores followed by zip-specific ones), built once at import;
+# lookups return these shared tuples
+DEFAULT_STORES: Tuple[Store, ...] = tuple(SYNTHETIC_STORES_DATABASE.get("default", []))
+STORES_BY_ZIP_PREFIX: Dict[str, Tuple[Store, ...]] = {
+    prefix: DEFAULT_STORES + tuple(stores)
+    for prefix, stores in SYNTHETIC_STORES_DATABASE.items()
+    if prefix != "default"
+}
+
+
+def get_stores_for_zip(zip_code: str) -> Tuple[Store, ...]:
     """Get stores near a zip code (simulated lookup)."""
-    # Check for zip-code-specific stores
-    zip_prefix = zip_code[:3] if len(zip_code) >= 3 else zip_code
-    
-    stores = list(SYNTHETIC_STORES_DATABASE.get("default", []))
-    
-    # Add any zip-specific stores
-    if zip_prefix in SYNTHETIC_STORES_DATABASE:
-        stores.extend(SYNTHETIC_STORES_DATABASE[zip_prefix])
-    
-    return stores
+    return STORES_BY_ZIP_PREFIX.get(zip_code[:3], DEFAULT_STORES)
 
 
-def calculate_travel_time(distance_miles: float, method: str) -> int:
-    """Calculate estimated travel time in minutes."""
-    speeds = {
-        "walk": 3.0,  # mph
-        "transit": 12.0,  # mph average including wait
-        "drive": 25.0  # mph average with traffic
-    }
-    speed = speeds.get(method, 3.0)
-    base_time = (distance_miles / speed) * 60
-    
-    # Add overhead
-    if method == "transit":
-        base_time += 10  # Wait time
-    elif method == "walk":
-        base_time += 5  # Round trip buffer
-    
-    return int(base_time)
+# Preferred travel method and max practical distance (miles),
+# indexed by (has_vehicle << 1) | has_public_transit
+TRAVEL_MODES: Tuple[Tuple[str, float], ...] = (
+    ("walk", 2.0),      # no vehicle, no transit
+    ("transit", 8.0),   # transit only
+    ("drive", 15.0),    # vehicle
+    ("drive", 15.0),    # vehicle and transit
+)
+
 
+def select_travel_mode(logistics: Logistics) -> Tuple[str, float]:
+    """Return the preferred travel method and its max practical distance (miles)."""
+    return TRAVEL_MODES[(bool(logistics.has_vehicle) << 1) | bool(logistics.has_public_transit)]
 
-def calculate_travel_feasibility(store: Store, logistics: Logistics) -> TravelFeasibility:
+
+def calculate_travel_feasibility(
+    store: Store,
+    logistics: Logistics,
+    travel_mode: Optional[Tuple[str, float]] = None
+) -> TravelFeasibility:
     """
     Calculate travel feasibility for a specific store based on user logistics.
+    
+    travel_mode is select_travel_mode(logistics); pass it in when evaluating many stores
+    for the same user so the logistics branch is taken once.
     """
-    notes = []
+    notes: Tuple[str, ...] = ()
     
     # Determine best travel method
-    if logistics.has_vehicle:
-        travel_method = "drive"
-        max_practical_distance = 15.0
-    elif logistics.has_public_transit:
-        travel_method = "transit"
-        max_practical_distance = 8.0
-    else:
-        travel_method = "walk"
-        max_practical_distance = 2.0
+    travel_method, max_practical_distance = travel_mode or select_travel_mode(logistics)
     
     # Check accessibility
     is_accessible = store.distance_miles <= logistics.max_travel_distance_miles
@@ -265,29 +336,26 @@ def calculate_travel_feasibility(store: Store, logistics: Logistics) -> TravelFe
         if store.distance_miles <= 2.0:
             travel_method = "walk"
             is_accessible = True
-            notes.append("Walking distance")
+            notes = ("Walking distance",)
         elif store.distance_miles <= 8.0 and logistics.has_public_transit:
             travel_method = "transit"
             is_accessible = True
-            notes.append("Accessible via public transit")
+            notes = ("Accessible via public transit",)
     
     # Calculate travel time
-    travel_time = calculate_travel_time(store.distance_miles, travel_method)
+    travel_time = store.travel_minutes[travel_method]
     
     # Calculate accessibility score
     distance_score = max(0, 1 - (store.distance_miles / max_practical_distance))
     time_score = max(0, 1 - (travel_time / 60))  # Penalize trips over 60 min
-    inventory_score = {InventoryLevel.HIGH: 1.0, InventoryLevel.MEDIUM: 0.7, InventoryLevel.LOW: 0.4}[store.inventory_level]
+    inventory_score = INVENTORY_SCORES[store.inventory_idx]
     
     accessibility_score = (distance_score * 0.4 + time_score * 0.3 + inventory_score * 0.3)
     
-    # Add notes
-    if store.store_type == StoreType.FOOD_PANTRY:
-        notes.append("FREE - Food pantry")
-    if store.distance_miles <= 1.0:
-        notes.append("Very close")
+    # Add notes (the store's own notes are shared, not rebuilt per user)
+    notes += store.store_notes
     if travel_time > 45:
-        notes.append("Long travel time")
+        notes += ("Long travel time",)
         is_accessible = is_accessible and logistics.grocery_trips_per_week >= 2
     
     return TravelFeasibility(
@@ -309,108 +377,147 @@ def resource_locator(user_context: UserContext) -> ResourceMap:
         
     Returns:
         ResourceMap with accessible stores, food pantries, and SNAP stores
+        (shared between users with the same logistics; its sequences are tuples)
     """
+    logistics = user_context.logistics
+    return _locate_resources(
+        logistics.zip_code,
+        logistics.has_vehicle,
+        logistics.has_public_transit,
+        logistics.grocery_trips_per_week,
+        logistics.max_travel_distance_miles,
+        user_context.financials.has_assistance,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _locate_resources(
+    zip_code: str,
+    has_vehicle: bool,
+    has_public_transit: bool,
+    grocery_trips_per_week: int,
+    max_travel_distance_miles: float,
+    has_assistance: bool
+) -> ResourceMap:
+    """Build the ResourceMap for one logistics profile; memoized on the fields it reads."""
     # Get all stores for user's zip code
-    all_stores = get_stores_for_zip(user_context.logistics.zip_code)
-    
-    # Calculate travel feasibility for each store
-    all_feasibility: List[TravelFeasibility] = []
-    for store in all_stores:
-        feasibility = calculate_travel_feasibility(store, user_context.logistics)
-        all_feasibility.append(feasibility)
+    all_stores = get_stores_for_zip(zip_code)
+    if not all_stores:
+        return ResourceMap(
+            user_zip=zip_code,
+            accessible_stores=(),
+            food_pantries=(),
+            snap_stores=(),
+            all_stores=all_stores
+        )
     
-    # Filter accessible stores
-    accessible_stores = [f for f in all_feasibility if f.is_accessible]
-    accessible_stores.sort(key=lambda x: (-x.accessibility_score, x.store.distance_miles))
+    logistics = Logistics(
+        zip_code=zip_code,
+        has_vehicle=has_vehicle,
+        has_public_transit=has_public_transit,
+        grocery_trips_per_week=grocery_trips_per_week,
+        max_travel_distance_miles=max_travel_distance_miles
+    )
     
-    # Filter food pantries
-    food_pantries = [f for f in accessible_stores if f.store.store_type == StoreType.FOOD_PANTRY]
+    # Calculate travel feasibility for each store and keep the accessible ones
+    travel_mode = select_travel_mode(logistics)
+    accessible_stores = [
+        f for f in (calculate_travel_feasibility(store, logistics, travel_mode) for store in all_stores)
+        if f.is_accessible
+    ]
+    accessible_stores.sort(key=attrgetter('sort_key'))
     
-    # Filter SNAP-accepting stores
-    snap_stores = [f for f in accessible_stores if f.store.snap_accepted]
+    # Split out food pantries and SNAP-accepting stores in one pass
+    food_pantries = []
+    snap_stores = []
+    for f in accessible_stores:
+        if f.store.is_food_pantry:
+            food_pantries.append(f)
+        if f.store.snap_accepted:
+            snap_stores.append(f)
     
     # Prioritize based on user's financial situation
-    if user_context.financials.has_assistance:
+    if has_assistance:
         # Move SNAP/WIC stores to top
-        snap_stores.sort(key=lambda x: (x.store.price_tier, x.store.distance_miles))
+        snap_stores.sort(key=attrgetter('store.price_sort_key'))
     
     return ResourceMap(
-        user_zip=user_context.logistics.zip_code,
-        accessible_stores=accessible_stores,
-        food_pantries=food_pantries,
-        snap_stores=snap_stores,
+        user_zip=zip_code,
+        accessible_stores=tuple(accessible_stores),
+        food_pantries=tuple(food_pantries),
+        snap_stores=tuple(snap_stores),
         all_stores=all_stores
     )
 
 
 def print_resource_map(resource_map: ResourceMap, user_context: UserContext) -> None:
     """Print a formatted resource map."""
-    print("\n" + "="*60)
-    print("  RESOURCE LOCATOR - Nearby Food Resources")
-    print("="*60)
-    print(f"\n📍 Location: ZIP {resource_map.user_zip}")
-    print(f"🚗 Transportation: {user_context.logistics.mobility_level.upper()}")
+    financials = user_context.financials
+    lines = [
+        "\n" + "="*60,
+        "  RESOURCE LOCATOR - Nearby Food Resources",
+        "="*60,
+        f"\n📍 Location: ZIP {resource_map.user_zip}",
+        f"🚗 Transportation: {user_context.logistics.mobility_level.upper()}",
+    ]
     
     # Food Pantries (if budget is low)
-    if resource_map.food_pantries and user_context.financials.budget_tier in ["very_low", "low"]:
-        print("\n🆓 FREE FOOD PANTRIES:")
+    if resource_map.food_pantries and financials.budget_tier in ["very_low", "low"]:
+        lines.append("\n🆓 FREE FOOD PANTRIES:")
         for tf in resource_map.food_pantries[:3]:
-            print(f"   • {tf.store.name}")
-            print(f"     Distance: {tf.store.distance_miles} mi ({tf.travel_method}, ~{tf.estimated_time_minutes} min)")
-            print(f"     Hours: {tf.store.hours}")
-            print(f"     Items: {', '.join(tf.store.specialty_items[:3])}")
+            store = tf.store
+            lines.append(f"   • {store.name}")
+            lines.append(f"     Distance: {store.distance_miles} mi ({tf.travel_method}, ~{tf.estimated_time_minutes} min)")
+            lines.append(f"     Hours: {store.hours}")
+            lines.append(f"     Items: {', '.join(store.specialty_items[:3])}")
     
     # SNAP-Authorized Stores
-    if resource_map.snap_stores and user_context.financials.snap_status:
-        print("\n🏪 SNAP-AUTHORIZED STORES:")
+    if resource_map.snap_stores and financials.snap_status:
+        lines.append("\n🏪 SNAP-AUTHORIZED STORES:")
         for tf in resource_map.snap_stores[:4]:
-            if tf.store.store_type != StoreType.FOOD_PANTRY:
-                price_symbol = "$" * tf.store.price_tier
-                print(f"   • {tf.store.name} [{price_symbol}]")
-                print(f"     Distance: {tf.store.distance_miles} mi ({tf.travel_method})")
-                print(f"     Inventory: {tf.store.inventory_level.value}")
+            store = tf.store
+            if not store.is_food_pantry:
+                price_symbol = "$" * store.price_tier
+                lines.append(f"   • {store.name} [{price_symbol}]")
+                lines.append(f"     Distance: {store.distance_miles} mi ({tf.travel_method})")
+                lines.append(f"     Inventory: {store.inventory_level.value}")
     
     # All Accessible Stores
-    print("\n📋 ALL ACCESSIBLE STORES (by score):")
+    lines.append("\n📋 ALL ACCESSIBLE STORES (by score):")
     for i, tf in enumerate(resource_map.accessible_stores[:6], 1):
-        price_symbol = "FREE" if tf.store.store_type == StoreType.FOOD_PANTRY else "$" * tf.store.price_tier
-        snap_marker = " [SNAP]" if tf.store.snap_accepted else ""
-        wic_marker = " [WIC]" if tf.store.wic_accepted else ""
+        store = tf.store
+        price_symbol = "FREE" if store.is_food_pantry else "$" * store.price_tier
+        snap_marker = " [SNAP]" if store.snap_accepted else ""
+        wic_marker = " [WIC]" if store.wic_accepted else ""
         
-        print(f"   {i}. {tf.store.name} [{price_symbol}]{snap_marker}{wic_marker}")
-        print(f"      Type: {tf.store.store_type.value} | Score: {tf.accessibility_score}")
-        print(f"      {tf.store.distance_miles} mi via {tf.travel_method} (~{tf.estimated_time_minutes} min)")
+        lines.append(f"   {i}. {store.name} [{price_symbol}]{snap_marker}{wic_marker}")
+        lines.append(f"      Type: {store.store_type.value} | Score: {tf.accessibility_score}")
+        lines.append(f"      {store.distance_miles} mi via {tf.travel_method} (~{tf.estimated_time_minutes} min)")
         if tf.notes:
-            print(f"      Notes: {', '.join(tf.notes)}")
+            lines.append(f"      Notes: {', '.join(tf.notes)}")
+    
+    # One write for the whole map instead of a print() per line
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def get_stores_with_item(resource_map: ResourceMap, item: str) -> List[TravelFeasibility]:
     """Find stores that likely have a specific item."""
     matching_stores = []
     
-    # Keywords for different food categories
-    item_keywords = {
-        "produce": ["produce", "fresh", "farmers", "organic"],
-        "spinach": ["produce", "fresh", "organic", "leafy"],
-        "eggs": ["eggs", "dairy", "fresh", "farmers"],
-        "fish": ["fresh", "specialty", "salmon", "seafood"],
-        "salmon": ["fresh", "specialty", "seafood"],
-        "beans": ["bulk", "canned", "staples", "basic"],
-        "lentils": ["bulk", "specialty", "organic"],
-        "nuts": ["bulk", "specialty", "snacks"],
-        "supplements": ["supplements", "specialty", "health"],
-    }
-    
     item_lower = item.lower()
-    search_keywords = item_keywords.get(item_lower, [item_lower])
+    known_item = item_lower in ITEM_KEYWORDS
     
     for feasibility in resource_map.accessible_stores:
         store = feasibility.store
-        # Check if store might have this item
-        store_items = " ".join(store.specialty_items).lower()
-        if any(kw in store_items for kw in search_keywords):
+        # Check if store might have this item: known items were matched per store at
+        # construction, anything else is a substring test on the specialty text
+        if known_item:
+            has_item = item_lower in store.keyword_items
+        else:
+            has_item = item_lower in store.specialty_text
+        if has_item:
             matching_stores.append(feasibility)
-        elif store.inventory_level == InventoryLevel.HIGH:
+        elif store.inventory_level is InventoryLevel.HIGH:
             # High inventory stores likely have most items
             matching_stores.append(feasibility)
     
@@ -3,8 +3,13 @@ Phase 4: The Curated Planner
 Shopping list generator that prioritizes based on biological needs, budget, and store inventory.
 """
 
+import heapq
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from itertools import count
+from operator import attrgetter
+from typing import List, Dict, Optional, Sequence, Tuple
 from enum import Enum
 
 from user_context import UserContext
@@ -12,6 +17,10 @@ from bio_analyzer import NutrientPriorityList, NutrientNeed
 from resource_locator import ResourceMap, TravelFeasibility, StoreType, InventoryLevel
 
 
+# FoodItem records are read-only once built; slots where dataclasses support them (3.10+)
+_FROZEN = {"frozen": True, "slots": True} if sys.version_info >= (3, 10) else {"frozen": True}
+
+
 class ShoppingPriority(Enum):
     CRITICAL = 1  # Must buy
     HIGH = 2  # Important
@@ -19,7 +28,7 @@ class ShoppingPriority(Enum):
     OPTIONAL = 4  # If budget allows
 
 
-@dataclass
+@dataclass(**_FROZEN)
 class FoodItem:
     """Represents a food item with pricing and nutrient info."""
     name: str
@@ -27,9 +36,14 @@ class FoodItem:
     price_estimate: float  # Per unit/serving
     snap_eligible: bool = True
     wic_eligible: bool = False
-    nutrients_provided: List[str] = field(default_factory=list)
+    nutrients_provided: Tuple[str, ...] = ()  # Lists are accepted and stored as a tuple
     serving_size: str = "1 serving"
     shelf_life_days: int = 7
+    name_lower: str = field(init=False, repr=False, compare=False)  # For allergy matching
+    
+    def __post_init__(self):
+        object.__setattr__(self, "nutrients_provided", tuple(self.nutrients_provided))
+        object.__setattr__(self, "name_lower", self.name.lower())
 
 
 @dataclass
@@ -42,6 +56,10 @@ class ShoppingListItem:
     suggested_store: Optional[str] = None
     estimated_cost: float = 0.0
     nutrients_addressed: List[str] = field(default_factory=list)
+    priority_value: int = field(init=False, repr=False, compare=False)  # Sort key
+    
+    def __post_init__(self):
+        self.priority_value = self.priority.value
 
 
 @dataclass
@@ -143,13 +161,125 @@ BUDGET_ALTERNATIVES: Dict[str, str] = {
 }
 
 
-def get_foods_for_nutrient(nutrient: str) -> List[FoodItem]:
-    """Get all foods that provide a specific nutrient, sorted by price."""
-    matching_foods = []
+def _index_foods_by_nutrient() -> Dict[str, Tuple[FoodItem, ...]]:
+    """Map each nutrient to the foods providing it, cheapest first (ties keep database order)."""
+    index: Dict[str, List[FoodItem]] = {}
     for food in FOOD_DATABASE.values():
-        if nutrient in food.nutrients_provided:
-            matching_foods.append(food)
-    return sorted(matching_foods, key=lambda x: x.price_estimate)
+        for nutrient in dict.fromkeys(food.nutrients_provided):
+            index.setdefault(nutrient, []).append(food)
+    return {
+        nutrient: tuple(sorted(foods, key=lambda x: x.price_estimate))
+        for nutrient, foods in index.items()
+    }
+
+
+# Built once at import; get_foods_for_nutrient is a dict lookup
+FOODS_BY_NUTRIENT: Dict[str, Tuple[FoodItem, ...]] = _index_foods_by_nutrient()
+
+# Budget tiers that get pantry-first planning and budget alternatives
+LOW_BUDGET_TIERS = frozenset({"very_low", "low"})
+
+# "auto" strategy: re-plan with the knapsack when greedy leaves this share of the budget unused
+AUTO_OPTIMAL_SLACK = 0.25
+
+# Phase 3 fill-in staples, in the order they are tried
+STAPLE_FOODS: Tuple[FoodItem, ...] = tuple(
+    FOOD_DATABASE[key]
+    for key in ("oats", "brown_rice", "black_beans_canned", "bananas", "peanut_butter")
+    if key in FOOD_DATABASE
+)
+
+# FoodItem name -> FOOD_DATABASE key (first key wins if two entries share a name)
+FOOD_KEYS_BY_NAME: Dict[str, str] = {
+    food.name: key for key, food in reversed(list(FOOD_DATABASE.items()))
+}
+
+# Food name -> its resolved BUDGET_ALTERNATIVES FoodItem, for low-budget swaps
+BUDGET_ALTERNATIVE_FOODS: Dict[str, FoodItem] = {
+    name: FOOD_DATABASE[BUDGET_ALTERNATIVES[key]]
+    for name, key in FOOD_KEYS_BY_NAME.items()
+    if BUDGET_ALTERNATIVES.get(key) in FOOD_DATABASE
+}
+
+
+def get_foods_for_nutrient(nutrient: str) -> Tuple[FoodItem, ...]:
+    """Get all foods that provide a specific nutrient, sorted by price."""
+    return FOODS_BY_NUTRIENT.get(nutrient, ())
+
+
+@lru_cache(maxsize=512)
+def get_safe_foods_for_nutrient(nutrient: str, allergies: Tuple[str, ...]) -> Tuple[FoodItem, ...]:
+    """
+    get_foods_for_nutrient(nutrient) minus any food whose name contains one of the allergies.
+    Allergies should be a sorted tuple of lowercase strings so equal sets share a cache entry.
+    """
+    foods = get_foods_for_nutrient(nutrient)
+    if not allergies:
+        return foods
+    return tuple(f for f in foods if not any(allergy in f.name_lower for allergy in allergies))
+
+
+def solve_shopping_knapsack(
+    foods: Sequence[FoodItem],
+    budget: float,
+    nutrient_values: Dict[str, float]
+) -> List[FoodItem]:
+    """
+    Pick the set of foods with the most nutrient value that fits the budget (0/1 knapsack).
+    
+    A food's value is the sum of nutrient_values over the nutrients it provides; its
+    weight is its price. Solved exactly with best-first branch and bound, using the
+    fractional (LP relaxation) fill as the upper bound. Returns foods in input order.
+    """
+    free: List[int] = []  # Valuable foods that cost nothing are always taken
+    candidates: List[Tuple[float, float, int]] = []  # (value, price, index)
+    for i, food in enumerate(foods):
+        value = sum(nutrient_values.get(n, 0.0) for n in food.nutrients_provided)
+        if value <= 0:
+            continue
+        if food.price_estimate <= 0:
+            free.append(i)
+        elif food.price_estimate <= budget:
+            candidates.append((value, food.price_estimate, i))
+    
+    # Best value-per-dollar first, so the LP bound is a greedy fill
+    candidates.sort(key=lambda c: c[0] / c[1], reverse=True)
+    n = len(candidates)
+    
+    def upper_bound(k: int, value: float, spent: float) -> float:
+        room = budget - spent
+        for item_value, price, _ in candidates[k:]:
+            if price <= room:
+                room -= price
+                value += item_value
+            else:
+                return value + item_value * room / price
+        return value
+    
+    best_value = 0.0
+    best_taken: Tuple[int, ...] = ()
+    tie = count()  # Keeps heap entries comparable when bounds are equal
+    # Nodes: (-bound, tie, next candidate, value so far, spent so far, taken indices)
+    heap = [(-upper_bound(0, 0.0, 0.0), next(tie), 0, 0.0, 0.0, ())]
+    while heap:
+        neg_bound, _, k, value, spent, taken = heapq.heappop(heap)
+        if -neg_bound <= best_value + 1e-9:
+            break  # Best-first: no remaining node can beat the incumbent
+        if value > best_value:
+            best_value, best_taken = value, taken
+        if k == n:
+            continue
+        item_value, price, index = candidates[k]
+        # Branch: take candidate k (if it fits), or skip it
+        if spent + price <= budget:
+            bound = upper_bound(k + 1, value + item_value, spent + price)
+            if bound > best_value + 1e-9:
+                heapq.heappush(heap, (-bound, next(tie), k + 1, value + item_value, spent + price, taken + (index,)))
+        bound = upper_bound(k + 1, value, spent)
+        if bound > best_value + 1e-9:
+            heapq.heappush(heap, (-bound, next(tie), k + 1, value, spent, taken))
+    
+    return [foods[i] for i in sorted(free + list(best_taken))]
 
 
 def calculate_priority(nutrient_priority: int, budget_tier: str) -> ShoppingPriority:
@@ -164,10 +294,37 @@ def calculate_priority(nutrient_priority: int, budget_tier: str) -> ShoppingPrio
         return ShoppingPriority.OPTIONAL
 
 
+def _plan_optimal_basket(
+    top_needs: Sequence[NutrientNeed],
+    allergies: Tuple[str, ...],
+    snap_required: bool,
+    budget: float
+) -> List[Tuple[FoodItem, List[NutrientNeed]]]:
+    """Knapsack-select foods for all needs at once; returns each food with the needs it covers."""
+    # Priority 1 needs are worth the most; lower priorities taper to 1
+    nutrient_values: Dict[str, float] = {}
+    for need in top_needs:
+        nutrient_values.setdefault(need.nutrient, float(6 - min(need.priority, 5)))
+    
+    candidates: Dict[str, FoodItem] = {}
+    for need in top_needs:
+        for food in get_safe_foods_for_nutrient(need.nutrient, allergies):
+            if snap_required and not food.snap_eligible:
+                continue
+            candidates.setdefault(food.name, food)
+    
+    basket = solve_shopping_knapsack(list(candidates.values()), budget, nutrient_values)
+    return [
+        (food, [need for need in top_needs if need.nutrient in food.nutrients_provided])
+        for food in basket
+    ]
+
+
 def generate_shopping_list(
     user_context: UserContext,
     nutrient_priorities: NutrientPriorityList,
-    resource_map: ResourceMap
+    resource_map: ResourceMap,
+    strategy: str = "greedy"
 ) -> ShoppingList:
     """
     Generate a curated shopping list based on biological needs, budget, and store availability.
@@ -182,27 +339,42 @@ def generate_shopping_list(
         user_context: User's complete context
         nutrient_priorities: Analyzed nutrient needs
         resource_map: Available stores and resources
+        strategy: "greedy" (cheapest suitable food per need, in priority order),
+            "optimal" (one exact knapsack over all needs, see solve_shopping_knapsack),
+            or "auto" (greedy, re-planned as optimal if it leaves 25%+ of the budget unused)
         
     Returns:
         ShoppingList with prioritized, affordable items
     """
+    if strategy == "auto":
+        shopping_list = generate_shopping_list(user_context, nutrient_priorities, resource_map)
+        if shopping_list.budget_remaining >= AUTO_OPTIMAL_SLACK * user_context.financials.weekly_budget:
+            return generate_shopping_list(user_context, nutrient_priorities, resource_map, "optimal")
+        return shopping_list
+    if strategy not in ("greedy", "optimal"):
+        raise ValueError(f"Unknown shopping list strategy: {strategy!r}")
+    
     shopping_list = ShoppingList(user_id=user_context.user_id)
     budget = user_context.financials.weekly_budget
     budget_tier = user_context.financials.budget_tier
+    is_low_budget = budget_tier in LOW_BUDGET_TIERS
     remaining_budget = budget
     
     # Track which nutrients we've addressed
     nutrients_addressed: Dict[str, List[str]] = {}
+    # Items already on the list, by food name, for O(1) duplicate checks
+    items_by_name: Dict[str, ShoppingListItem] = {}
     reasoning = []
     
     # Get top nutrient needs
     top_needs = nutrient_priorities.get_top_priorities(8)
+    allergies = tuple(sorted(set(user_context.medical.known_allergies_lc)))
     
     reasoning.append(f"Budget tier: {budget_tier} (${budget}/week)")
     reasoning.append(f"Top {len(top_needs)} nutrient priorities identified")
     
     # Phase 1: If low budget, recommend food pantry first
-    if budget_tier in ["very_low", "low"] and resource_map.food_pantries:
+    if is_low_budget and resource_map.food_pantries:
         reasoning.append("LOW BUDGET: Recommending food pantry as primary resource")
         
         pantry = resource_map.food_pantries[0]
@@ -228,7 +400,52 @@ def generate_shopping_list(
                 ))
     
     # Phase 2: Select foods for each nutrient priority
-    for need in top_needs:
+    # Best store: the top-ranked accessible store (SNAP-accepting for SNAP users) that
+    # isn't low on inventory; it doesn't depend on the need, so find it once
+    snap_required = user_context.financials.snap_status
+    best_store = next(
+        (
+            tf.store.name for tf in resource_map.accessible_stores
+            if (not snap_required or tf.store.snap_accepted)
+            and tf.store.inventory_level is not InventoryLevel.LOW
+        ),
+        None
+    )
+    
+    if strategy == "optimal":
+        # One knapsack over all top needs instead of a cheapest-first pick per need
+        basket = _plan_optimal_basket(top_needs, allergies, snap_required, remaining_budget)
+        covered_nutrients = set()
+        for food, needs in basket:
+            nutrients = list(dict.fromkeys(need.nutrient for need in needs))
+            lead = needs[0]  # Highest-priority need this food covers
+            item = ShoppingListItem(
+                food=food,
+                quantity=1,
+                priority=calculate_priority(lead.priority, budget_tier),
+                reason=f"Addresses {lead.nutrient}: {lead.reason[:80]}...",
+                suggested_store=best_store,
+                estimated_cost=food.price_estimate,
+                nutrients_addressed=nutrients
+            )
+            shopping_list.items.append(item)
+            items_by_name[food.name] = item
+            remaining_budget -= food.price_estimate
+            for nutrient in nutrients:
+                nutrients_addressed.setdefault(nutrient, []).append(food.name)
+            covered_nutrients.update(nutrients)
+            reasoning.append(
+                f"Added {food.name} (${food.price_estimate:.2f}) "
+                f"for {', '.join(nutrients)} [optimal basket]"
+            )
+        for need in top_needs:
+            if need.nutrient not in covered_nutrients:
+                reasoning.append(f"No affordable food selected for {need.nutrient}")
+        greedy_needs = ()
+    else:
+        greedy_needs = top_needs
+    
+    for need in greedy_needs:
         if remaining_budget <= 0:
             reasoning.append(f"BUDGET EXHAUSTED: Skipping {need.nutrient}")
             continue
@@ -240,11 +457,8 @@ def generate_shopping_list(
             reasoning.append(f"No foods found for {need.nutrient}")
             continue
         
-        # Filter by allergies
-        allergies = [a.lower() for a in user_context.medical.known_allergies]
-        safe_options = [f for f in food_options if not any(
-            allergy in f.name.lower() for allergy in allergies
-        )]
+        # Filter by allergies (memoized per nutrient and allergy set)
+        safe_options = get_safe_foods_for_nutrient(need.nutrient, allergies)
         
         if not safe_options:
             reasoning.append(f"All foods for {need.nutrient} conflict with allergies")
@@ -254,11 +468,8 @@ def generate_shopping_list(
         selected_food = None
         for food in safe_options:
             # Check for budget alternatives if tight budget
-            food_key = [k for k, v in FOOD_DATABASE.items() if v.name == food.name]
-            if budget_tier in ["very_low", "low"] and food_key:
-                alt_key = BUDGET_ALTERNATIVES.get(food_key[0])
-                if alt_key and alt_key in FOOD_DATABASE:
-                    food = FOOD_DATABASE[alt_key]
+            if is_low_budget:
+                food = BUDGET_ALTERNATIVE_FOODS.get(food.name, food)
             
             # Check if affordable
             if food.price_estimate <= remaining_budget:
@@ -273,15 +484,6 @@ def generate_shopping_list(
             # Take cheapest option even if over budget slightly
             selected_food = safe_options[0]
         
-        # Find best store for this item
-        best_store = None
-        for tf in resource_map.accessible_stores:
-            if user_context.financials.snap_status and not tf.store.snap_accepted:
-                continue
-            if tf.store.inventory_level != InventoryLevel.LOW:
-                best_store = tf.store.name
-                break
-        
         # Create shopping list item
         priority = calculate_priority(need.priority, budget_tier)
         
@@ -296,18 +498,14 @@ def generate_shopping_list(
         )
         
         # Track nutrients and add to list if not duplicate
-        already_have = any(
-            selected_food.name == existing.food.name 
-            for existing in shopping_list.items
-        )
+        existing = items_by_name.get(selected_food.name)
         
-        if not already_have:
+        if existing is None:
             shopping_list.items.append(item)
+            items_by_name[selected_food.name] = item
             remaining_budget -= selected_food.price_estimate
             
-            if need.nutrient not in nutrients_addressed:
-                nutrients_addressed[need.nutrient] = []
-            nutrients_addressed[need.nutrient].append(selected_food.name)
+            nutrients_addressed.setdefault(need.nutrient, []).append(selected_food.name)
             
             reasoning.append(
                 f"Added {selected_food.name} (${selected_food.price_estimate:.2f}) "
@@ -315,33 +513,24 @@ def generate_shopping_list(
             )
         else:
             # Add nutrient to existing item's list
-            for existing in shopping_list.items:
-                if existing.food.name == selected_food.name:
-                    if need.nutrient not in existing.nutrients_addressed:
-                        existing.nutrients_addressed.append(need.nutrient)
-                    break
+            if need.nutrient not in existing.nutrients_addressed:
+                existing.nutrients_addressed.append(need.nutrient)
     
     # Phase 3: Fill in with budget-friendly staples if budget allows
-    staples = ["oats", "brown_rice", "black_beans_canned", "bananas", "peanut_butter"]
-    
-    for staple_key in staples:
+    for staple in STAPLE_FOODS:
         if remaining_budget <= 2:
             break
-            
-        staple = FOOD_DATABASE.get(staple_key)
-        if not staple:
-            continue
-            
-        already_have = any(staple.name == item.food.name for item in shopping_list.items)
         
-        if not already_have and staple.price_estimate <= remaining_budget:
-            shopping_list.items.append(ShoppingListItem(
+        if staple.name not in items_by_name and staple.price_estimate <= remaining_budget:
+            item = ShoppingListItem(
                 food=staple,
                 quantity=1,
                 priority=ShoppingPriority.OPTIONAL,
                 reason="Budget-friendly staple for general nutrition",
                 estimated_cost=staple.price_estimate
-            ))
+            )
+            shopping_list.items.append(item)
+            items_by_name[staple.name] = item
             remaining_budget -= staple.price_estimate
             reasoning.append(f"Added staple: {staple.name}")
     
@@ -351,67 +540,71 @@ def generate_shopping_list(
     shopping_list.reasoning_log.extend(reasoning)
     
     # Organize by store
+    store_visits = shopping_list.store_visits
     for item in shopping_list.items:
-        store = item.suggested_store or "Any Store"
-        if store not in shopping_list.store_visits:
-            shopping_list.store_visits[store] = []
-        shopping_list.store_visits[store].append(item)
+        store_visits.setdefault(item.suggested_store or "Any Store", []).append(item)
     
     # Sort items by priority
-    shopping_list.items.sort(key=lambda x: x.priority.value)
+    shopping_list.items.sort(key=attrgetter('priority_value'))
     
     return shopping_list
 
 
+# Section headers for print_shopping_list
+PRIORITY_LABELS: Dict[ShoppingPriority, str] = {
+    ShoppingPriority.CRITICAL: "🔴 CRITICAL",
+    ShoppingPriority.HIGH: "🟠 HIGH",
+    ShoppingPriority.MODERATE: "🟡 MODERATE",
+    ShoppingPriority.OPTIONAL: "🟢 OPTIONAL"
+}
+
+
 def print_shopping_list(shopping_list: ShoppingList, user_context: UserContext) -> None:
     """Print a formatted shopping list."""
-    print("\n" + "="*60)
-    print("  CURATED SHOPPING LIST")
-    print("="*60)
-    
     budget = user_context.financials.weekly_budget
-    print(f"\n💰 Budget: ${budget:.2f} | Estimated Total: ${shopping_list.total_estimated_cost:.2f}")
-    print(f"   Remaining: ${shopping_list.budget_remaining:.2f}")
+    lines = [
+        "\n" + "="*60,
+        "  CURATED SHOPPING LIST",
+        "="*60,
+        f"\n💰 Budget: ${budget:.2f} | Estimated Total: ${shopping_list.total_estimated_cost:.2f}",
+        f"   Remaining: ${shopping_list.budget_remaining:.2f}",
+    ]
     
     if user_context.financials.snap_status:
-        print("   ✓ SNAP benefits applied")
+        lines.append("   ✓ SNAP benefits applied")
     
     # Food Pantry recommendations
     if shopping_list.pantry_items:
-        print("\n🆓 FROM FOOD PANTRY (FREE):")
+        lines.append("\n🆓 FROM FOOD PANTRY (FREE):")
         for item in shopping_list.pantry_items:
-            print(f"   • {item.food.name}")
+            lines.append(f"   • {item.food.name}")
             if item.suggested_store:
-                print(f"     Location: {item.suggested_store}")
+                lines.append(f"     Location: {item.suggested_store}")
     
     # Main shopping list
-    print("\n📋 SHOPPING LIST (by priority):")
-    
-    priority_labels = {
-        ShoppingPriority.CRITICAL: "🔴 CRITICAL",
-        ShoppingPriority.HIGH: "🟠 HIGH",
-        ShoppingPriority.MODERATE: "🟡 MODERATE", 
-        ShoppingPriority.OPTIONAL: "🟢 OPTIONAL"
-    }
+    lines.append("\n📋 SHOPPING LIST (by priority):")
     
     current_priority = None
     for item in shopping_list.items:
         if item.priority != current_priority:
             current_priority = item.priority
-            print(f"\n   {priority_labels[current_priority]}:")
+            lines.append(f"\n   {PRIORITY_LABELS[current_priority]}:")
         
         snap_tag = " [SNAP✓]" if item.food.snap_eligible else ""
-        print(f"      □ {item.food.name} - ${item.estimated_cost:.2f}{snap_tag}")
-        print(f"        Nutrients: {', '.join(item.nutrients_addressed[:3])}")
+        lines.append(f"      □ {item.food.name} - ${item.estimated_cost:.2f}{snap_tag}")
+        lines.append(f"        Nutrients: {', '.join(item.nutrients_addressed[:3])}")
         if item.suggested_store:
-            print(f"        Get at: {item.suggested_store}")
+            lines.append(f"        Get at: {item.suggested_store}")
     
     # Store visits summary
     if len(shopping_list.store_visits) > 1:
-        print("\n🏪 SUGGESTED STORE VISITS:")
+        lines.append("\n🏪 SUGGESTED STORE VISITS:")
         for store, items in shopping_list.store_visits.items():
             total = sum(i.estimated_cost for i in items)
-            print(f"   {store}: {len(items)} items (~${total:.2f})")
+            lines.append(f"   {store}: {len(items)} items (~${total:.2f})")
+    
+    # One write for the whole list instead of a print() per line
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def get_item_explanation(item: ShoppingListItem, nutrient_priorities: NutrientPriorityList) -> str:
@@ -419,6 +612,11 @@ def get_item_explanation(item: ShoppingListItem, nutrient_priorities: NutrientPr
     Generate a detailed explanation of why an item was chosen.
     Used for the interactive "Why?" feature.
     """
+    # Nutrient name -> its need (first one wins, as the old first-match scan did)
+    needs_by_name: Dict[str, NutrientNeed] = {}
+    for need in nutrient_priorities.needs:
+        needs_by_name.setdefault(need.nutrient, need)
+    
     explanation_parts = []
     
     explanation_parts.append(f"📦 {item.food.name}")
@@ -429,13 +627,12 @@ def get_item_explanation(item: ShoppingListItem, nutrient_priorities: NutrientPr
     
     for nutrient in item.nutrients_addressed:
         # Find the matching nutrient need
-        for need in nutrient_priorities.needs:
-            if need.nutrient == nutrient:
-                explanation_parts.append(f"\n   → {nutrient}:")
-                explanation_parts.append(f"     {need.reason}")
-                if need.related_markers:
-                    explanation_parts.append(f"     Related markers: {', '.join(need.related_markers[:3])}")
-                break
+        need = needs_by_name.get(nutrient)
+        if need is not None:
+            explanation_parts.append(f"\n   → {nutrient}:")
+            explanation_parts.append(f"     {need.reason}")
+            if need.related_markers:
+                explanation_parts.append(f"     Related markers: {', '.join(need.related_markers[:3])}")
     
     explanation_parts.append(f"\n   📊 This food provides: {', '.join(item.food.nutrients_provided)}")
     explanation_parts.append(f"\n   💡 Selection reason: {item.reason}")
@@ -3,25 +3,33 @@ Phase 1: Questionnaire Data Input
 UserContext class for storing user health equity app inputs.
 """
 
+import sys
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, Tuple
 
+# Questionnaire records are immutable once collected; they also drop their per-instance
+# __dict__ where dataclasses support slots (3.10+)
+_FROZEN = {"frozen": True, "slots": True} if sys.version_info >= (3, 10) else {"frozen": True}
 
-@dataclass
+
+@dataclass(**_FROZEN)
 class Financials:
     """Financial information for resource planning."""
     weekly_budget: float  # In dollars
     snap_status: bool = False  # SNAP (Supplemental Nutrition Assistance Program)
     wic_status: bool = False  # WIC (Women, Infants, and Children)
     annual_income: Optional[float] = None  # Optional for privacy
+    budget_tier: str = field(init=False, repr=False, compare=False)  # Set once from weekly_budget
+    
+    def __post_init__(self):
+        object.__setattr__(self, "budget_tier", self._categorize_budget())
     
     @property
     def has_assistance(self) -> bool:
         """Check if user has any food assistance."""
         return self.snap_status or self.wic_status
     
-    @property
-    def budget_tier(self) -> str:
+    def _categorize_budget(self) -> str:
         """Categorize budget for planning purposes."""
         if self.weekly_budget < 50:
             return "very_low"
@@ -33,7 +41,7 @@ class Financials:
             return "comfortable"
 
 
-@dataclass
+@dataclass(**_FROZEN)
 class Logistics:
     """Logistical constraints for resource access."""
     zip_code: str
@@ -41,9 +49,12 @@ class Logistics:
     has_public_transit: bool = False
     grocery_trips_per_week: int = 1
     max_travel_distance_miles: float = 5.0  # Default walking distance
+    mobility_level: str = field(init=False, repr=False, compare=False)  # Set once from transport access
     
-    @property
-    def mobility_level(self) -> str:
+    def __post_init__(self):
+        object.__setattr__(self, "mobility_level", self._assess_mobility())
+    
+    def _assess_mobility(self) -> str:
         """Assess mobility for resource planning."""
         if self.has_vehicle:
             return "high"
@@ -53,26 +64,42 @@ class Logistics:
             return "limited"
 
 
-@dataclass
+@dataclass(**_FROZEN)
 class MedicalHistory:
     """Medical information for nutritional analysis."""
-    family_history: List[str] = field(default_factory=list)
+    family_history: Tuple[str, ...] = ()
     # e.g., ["diabetes", "heart_disease", "hypertension"]
     
-    previous_conditions: List[str] = field(default_factory=list)
+    previous_conditions: Tuple[str, ...] = ()
     # e.g., ["anemia", "vitamin_d_deficiency"]
     
-    current_symptoms: List[str] = field(default_factory=list)
+    current_symptoms: Tuple[str, ...] = ()
     # e.g., ["fatigue", "brain_fog", "joint_pain"]
     
-    known_allergies: List[str] = field(default_factory=list)
+    known_allergies: Tuple[str, ...] = ()
     # e.g., ["gluten", "dairy", "shellfish"]
     
-    medications: List[str] = field(default_factory=list)
+    medications: Tuple[str, ...] = ()
     # e.g., ["metformin", "lisinopril"]
+    
+    family_history_lc: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    current_symptoms_lc: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    known_allergies_lc: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """
+        Store the lists as tuples so the record stays immutable, then lowercase them once;
+        every analysis phase matches against the lowercased views.
+        """
+        for name in ("family_history", "previous_conditions", "current_symptoms",
+                     "known_allergies", "medications"):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+        object.__setattr__(self, "family_history_lc", tuple(h.lower() for h in self.family_history))
+        object.__setattr__(self, "current_symptoms_lc", tuple(s.lower() for s in self.current_symptoms))
+        object.__setattr__(self, "known_allergies_lc", tuple(a.lower() for a in self.known_allergies))
 
 
-@dataclass
+@dataclass(**_FROZEN)
 class LabResults:
     """Simulated lab and methylation results."""
     mthfr_variant: Optional[str] = None  # e.g., "C677T", "A1298C", "compound"